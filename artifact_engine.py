@@ -0,0 +1,59 @@
+import os
+import time
+
+# --- CONFIG ---
+TARGETS_DIR = 'targets'
+
+def sanitize_filename(text):
+    return "".join(c for c in text if c.isalnum() or c in " -_").strip()[:50]
+
+def target_dir_name(job_id, title, company):
+    """Pure path math: no makedirs, no stat."""
+    return f"{sanitize_filename(title)}_{sanitize_filename(company)}_{job_id}"
+
+# --- STATE TABLE ---
+# artifacts mirrors what exists under targets/ so listings never have to touch the disk.
+# Writers (strike, PDF, reset, manual save) call record()/clear(); reconcile() rebuilds it.
+def record(conn, job_id, dir_path, kind, path):
+    """kind is 'ai' (resume.json) or 'pdf' (resume.pdf)."""
+    col = "ai" if kind == "ai" else "pdf"
+    conn.execute(f"""INSERT INTO artifacts (job_id, dir, has_{col}, {col}_path, {col}_at) VALUES (?,?,1,?,?)
+                     ON CONFLICT(job_id) DO UPDATE SET dir=excluded.dir, has_{col}=1,
+                     {col}_path=excluded.{col}_path, {col}_at=excluded.{col}_at""",
+                 (job_id, dir_path, path, time.time()))
+    conn.commit()
+
+def clear(conn, job_id):
+    conn.execute("DELETE FROM artifacts WHERE job_id=?", (job_id,))
+    conn.commit()
+
+def scan(job_id, title, company):
+    """Disk truth for one job, as an artifacts row (or None when nothing is there)."""
+    t_dir = os.path.join(TARGETS_DIR, target_dir_name(job_id, title, company))
+    json_path = os.path.join(t_dir, "resume.json")
+    pdf_path = os.path.join(t_dir, "resume.pdf")
+    has_ai, has_pdf = os.path.exists(json_path), os.path.exists(pdf_path)
+    if not (has_ai or has_pdf): return None
+    return (job_id, t_dir, int(has_ai), int(has_pdf),
+            json_path if has_ai else None, pdf_path if has_pdf else None,
+            os.path.getmtime(json_path) if has_ai else None,
+            os.path.getmtime(pdf_path) if has_pdf else None)
+
+def rebuild(conn):
+    """Recomputes the artifacts table from targets/ without committing. One listdir, then a
+    stat pair only for jobs whose folder actually exists. Returns the rebuilt rows."""
+    try: present = set(os.listdir(TARGETS_DIR))
+    except OSError: present = set()
+    rows = []
+    for job in conn.execute("SELECT id, title, company FROM jobs"):
+        if target_dir_name(job[0], job[1], job[2]) not in present: continue
+        row = scan(job[0], job[1], job[2])
+        if row: rows.append(row)
+    conn.execute("DELETE FROM artifacts")
+    conn.executemany("INSERT INTO artifacts (job_id, dir, has_ai, has_pdf, ai_path, pdf_path, ai_at, pdf_at) VALUES (?,?,?,?,?,?,?,?)", rows)
+    return rows
+
+def reconcile(conn):
+    rows = rebuild(conn)
+    conn.commit()
+    return rows
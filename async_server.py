@@ -0,0 +1,135 @@
+import os
+import sys
+import json
+import asyncio
+import contextlib
+from datetime import datetime
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+import batch_engine
+import client_pool
+import server
+
+try:
+    from a2wsgi import WSGIMiddleware  # runs the WSGI app on its own thread pool
+except ImportError:
+    WSGIMiddleware = None
+
+# --- CONFIG ---
+# The strike routes below are native coroutines; everything else is the Flask app, mounted as-is.
+HOST = os.getenv("WAR_ROOM_HOST", "127.0.0.1")
+PORT = int(os.getenv("WAR_ROOM_PORT", "5000"))
+ASYNC_STRIKE_CONCURRENCY = int(os.getenv("ASYNC_STRIKE_CONCURRENCY", "200"))
+WSGI_WORKERS = int(os.getenv("WSGI_WORKERS", "16"))
+
+async def read_json(request):
+    try: return await request.json()
+    except ValueError: return {}
+
+def session_stamp():
+    return f"BATCH_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}"
+
+# --- STRIKES ---
+async def api_strike(request):
+    data = await read_json(request)
+    res = await server.aexecute_strike(data['id'], data['model'], data.get('temp', 0.7), data['session_id'],
+                                       use_cache=not data.get('no_cache'))
+    return JSONResponse(res)
+
+async def process_job(request):
+    data = await read_json(request)
+    res = await server.aexecute_strike(data['id'], data.get('model'), data.get('temp', 0.7), session_stamp(),
+                                       data.get('prompt_override'), use_cache=not data.get('no_cache'))
+    return JSONResponse(res)
+
+async def api_strike_stream(request):
+    data = await read_json(request)
+    gen = server.astream_strike(data['id'], data.get('model'), data.get('temp', 0.7),
+                                data.get('session_id') or session_stamp(),
+                                data.get('prompt_override'), use_cache=not data.get('no_cache'))
+
+    async def sse():
+        async for event, payload in gen:
+            yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+    return StreamingResponse(sse(), media_type='text/event-stream',
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# --- STRIKE QUEUE ---
+async def run_queued_strike(task):
+    return await server.aexecute_strike(task['id'], task['model'], task['temp'], task['session_id'],
+                                        task.get('prompt_override'), key_wait=True, use_cache=task.get('use_cache', True),
+                                        layout=task.get('layout', server.BATCH_PROMPT_LAYOUT))
+
+strike_queue = batch_engine.AsyncStrikeQueue(run_queued_strike, ASYNC_STRIKE_CONCURRENCY)
+
+async def api_batch(request):
+    try: tasks, serial = server.batch_tasks(await read_json(request))
+    except ValueError as e: return JSONResponse({"status": "error", "message": str(e)})
+    batch_id = strike_queue.submit(tasks, serial)
+    return JSONResponse({"status": "queued", "batch_id": batch_id, "total": len(tasks)})
+
+async def api_batch_status(request):
+    info = strike_queue.status(request.query_params.get('id'))
+    if not info: return JSONResponse({"status": "error", "message": "Unknown batch"})
+    info['keys'] = server.deck.snapshot()
+    info['routes'] = server.proxy_pool.pool.snapshot()
+    return JSONResponse(info)
+
+async def api_batch_cancel(request):
+    cancelled = strike_queue.cancel((await read_json(request)).get('id'))
+    return JSONResponse({"status": "cancelled", "cancelled": cancelled})
+
+# --- SMOKE CHECK ---
+async def smoke(job_id, model):
+    """One plain and one streamed strike through the async path against the real API.
+    Runs as a gauntlet session: output lands in gauntlet/ and the job's status is untouched."""
+    session_id = f"GAUNTLET_SMOKE_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}"
+    try:
+        res = await server.aexecute_strike(job_id, model, 0.2, session_id, use_cache=False)
+        ok = res.get('status') == 'success'
+        print(f"[{'*' if ok else '!'}] SMOKE strike: {res.get('status') or 'failed'} {res.get('error') or ''} (key {res.get('key')}, {res.get('duration', 0):.2f}s)")
+        events = {}
+        async for event, payload in server.astream_strike(job_id, model, 0.2, session_id, use_cache=False):
+            events[event] = events.get(event, 0) + 1
+            if event == "error": print(f"[!] SMOKE stream error: {payload.get('error')}")
+        streamed = events.get("done") == 1 and events.get("token", 0) > 0
+        print(f"[{'*' if streamed else '!'}] SMOKE stream: {events}")
+        return ok and streamed
+    finally:
+        await client_pool.apool.aclose_all()
+
+# --- APP ---
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    print(f"\n--- WAR ROOM ONLINE (ASGI, {ASYNC_STRIKE_CONCURRENCY} strike slots) ---")
+    server.proxy_pool.pool.start()
+    yield
+    strike_queue.shutdown()
+    await client_pool.apool.aclose_all()
+    await asyncio.to_thread(server.adb.close)
+
+if WSGIMiddleware is not None:
+    flask_app = WSGIMiddleware(server.app, workers=WSGI_WORKERS)
+else:
+    from starlette.middleware.wsgi import WSGIMiddleware as StarletteWSGI
+    flask_app = StarletteWSGI(server.app)  # deprecated upstream but still works; a2wsgi is preferred
+
+app = Starlette(routes=[
+    Route('/api/strike', api_strike, methods=['POST']),
+    Route('/api/process_job', process_job, methods=['POST']),
+    Route('/api/strike_stream', api_strike_stream, methods=['POST']),
+    Route('/api/batch', api_batch, methods=['POST']),
+    Route('/api/batch_status', api_batch_status),
+    Route('/api/batch_cancel', api_batch_cancel, methods=['POST']),
+    Mount('/', app=flask_app),  # /api/jobs, search, triage, PDFs, static: the Flask handlers on worker threads
+], lifespan=lifespan)
+
+if __name__ == "__main__":
+    if "--smoke" in sys.argv:
+        args = [a for a in sys.argv[1:] if a != "--smoke"]
+        if not args: sys.exit("Usage: python async_server.py --smoke <job_id> [model]")
+        sys.exit(0 if asyncio.run(smoke(args[0], args[1] if len(args) > 1 else "llama-3.3-70b-versatile")) else 1)
+    import uvicorn
+    uvicorn.run(app, host=HOST, port=PORT)
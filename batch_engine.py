@@ -0,0 +1,157 @@
+import asyncio
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# --- CONFIG ---
+MAX_BATCHES = 20  # Finished batches kept around for status polling
+
+class BatchLedger:
+    """Batch bookkeeping shared by the strike and PDF queues: entries per batch id, the oldest
+    finished batches dropped past `keep`, and the polling summary. Entries carry at least
+    n, id and state; `pending` lists the states that still count as not done."""
+    def __init__(self, keep=MAX_BATCHES, pending=("QUEUED", "RUNNING")):
+        self.keep = keep
+        self.pending = pending
+        self.batches = {}
+        self.lock = threading.Lock()
+
+    def add(self, entries, **extra):
+        batch_id = uuid.uuid4().hex[:12]
+        with self.lock:
+            self.batches[batch_id] = {"created": time.time(), "entries": entries, **extra}
+            self._trim()
+        return batch_id
+
+    def get(self, batch_id):
+        return self.batches.get(batch_id)
+
+    def _trim(self):
+        if len(self.batches) <= self.keep: return
+        done = [b for b, v in self.batches.items() if all(e['state'] not in self.pending for e in v['entries'])]
+        for b in sorted(done, key=lambda b: self.batches[b]['created'])[:len(self.batches) - self.keep]:
+            del self.batches[b]
+
+    def status(self, batch_id, describe):
+        """Counts per state plus describe(entry) for every entry; None for an unknown batch."""
+        with self.lock:
+            batch = self.batches.get(batch_id)
+            if not batch: return None
+            counts = {}
+            jobs = []
+            for e in batch['entries']:
+                counts[e['state']] = counts.get(e['state'], 0) + 1
+                jobs.append(describe(e))
+            done = sum(v for k, v in counts.items() if k not in self.pending)
+            return {"batch_id": batch_id, "total": len(jobs), "done": done, "counts": counts,
+                    "finished": done == len(jobs), "jobs": jobs}
+
+class StrikeQueue:
+    """Bounded worker pool for strikes. Key pacing happens in KeyDeck.draw(wait=True)."""
+    def __init__(self, strike_fn, workers=4):
+        self.strike_fn = strike_fn
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="strike")
+        self.ledger = BatchLedger(MAX_BATCHES)
+
+    def submit(self, tasks, serial=False):
+        """serial=True runs the strikes one after another on a single worker, for tasks that
+        write the same artifact (a gauntlet's models all land in the job's resume.json)."""
+        entries = []
+        for i, task in enumerate(tasks):
+            entries.append({"n": i, "id": task['id'], "model": task['model'], "state": "QUEUED",
+                            "started": None, "finished": None, "result": None})
+        batch_id = self.ledger.add(entries, cancelled=False)
+        pairs = list(zip(tasks, entries))
+        if serial: self._dispatch_chain(batch_id, pairs)
+        else:
+            for task, entry in pairs: self._dispatch(batch_id, task, entry)
+        print(f"[*] STRIKE QUEUE: Batch {batch_id} armed with {len(tasks)} strikes{' (serial)' if serial else ''}.")
+        return batch_id
+
+    def _dispatch(self, batch_id, task, entry):
+        self.pool.submit(self._run, batch_id, task, entry)
+
+    def _dispatch_chain(self, batch_id, pairs):
+        self.pool.submit(self._run_chain, batch_id, pairs)
+
+    def _begin(self, batch_id, entry):
+        if (self.ledger.get(batch_id) or {}).get('cancelled'):
+            entry['state'] = "CANCELLED"
+            return False
+        entry['state'] = "RUNNING"
+        entry['started'] = time.time()
+        return True
+
+    def _end(self, entry, res):
+        entry['state'] = "SUCCESS" if res.get('status') == 'success' else "FAILED"
+        entry['result'] = res
+        entry['finished'] = time.time()
+
+    def _run(self, batch_id, task, entry):
+        if not self._begin(batch_id, entry): return
+        try: res = self.strike_fn(task)
+        except Exception as e: res = {"status": "failed", "error": str(e)}
+        self._end(entry, res)
+
+    def _run_chain(self, batch_id, pairs):
+        for task, entry in pairs: self._run(batch_id, task, entry)
+
+    def cancel(self, batch_id):
+        """Queued strikes are dropped; strikes already in flight run to completion."""
+        with self.ledger.lock:
+            batch = self.ledger.get(batch_id)
+            if not batch: return 0
+            batch['cancelled'] = True
+            return sum(1 for e in batch['entries'] if e['state'] == "QUEUED")
+
+    @staticmethod
+    def _describe(e):
+        res = e['result'] or {}
+        return {
+            "n": e['n'], "id": e['id'], "model": e['model'], "state": e['state'],
+            "elapsed": round((e['finished'] or time.time()) - e['started'], 2) if e['started'] else None,
+            "key": res.get('key'), "error": res.get('error'),
+            "file": res.get('file'), "pdf_job": res.get('pdf_job'),
+            "preview": (res.get('response') or "")[:100]
+        }
+
+    def status(self, batch_id):
+        return self.ledger.status(batch_id, self._describe)
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+class AsyncStrikeQueue(StrikeQueue):
+    """StrikeQueue for the ASGI server: strike_fn is a coroutine function and each strike is a
+    task on the running loop. A semaphore caps how many are in flight instead of a thread count,
+    so hundreds of strikes can sit on the network at once. submit() must be called from the loop."""
+    def __init__(self, strike_fn, concurrency=200):
+        self.strike_fn = strike_fn
+        self.limit = asyncio.Semaphore(concurrency)
+        self.tasks = set()
+        self.ledger = BatchLedger(MAX_BATCHES)
+
+    def _spawn(self, coro):
+        t = asyncio.get_running_loop().create_task(coro)
+        self.tasks.add(t)
+        t.add_done_callback(self.tasks.discard)
+
+    def _dispatch(self, batch_id, task, entry):
+        self._spawn(self._arun(batch_id, task, entry))
+
+    def _dispatch_chain(self, batch_id, pairs):
+        self._spawn(self._arun_chain(batch_id, pairs))
+
+    async def _arun(self, batch_id, task, entry):
+        async with self.limit:
+            if not self._begin(batch_id, entry): return
+            try: res = await self.strike_fn(task)
+            except Exception as e: res = {"status": "failed", "error": str(e)}
+            self._end(entry, res)
+
+    async def _arun_chain(self, batch_id, pairs):
+        for task, entry in pairs: await self._arun(batch_id, task, entry)
+
+    def shutdown(self):
+        for t in self.tasks: t.cancel()
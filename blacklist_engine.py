@@ -0,0 +1,71 @@
+import re
+import db_engine
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+# --- CONFIG ---
+DB_FILE = db_engine.DB_FILE
+SCAN_BATCH = 5000
+
+class BlacklistMatcher:
+    """All blacklist terms compiled into one automaton (pyahocorasick) or one alternation regex,
+    so a title/employer check is a single pass no matter how many terms there are."""
+    def __init__(self, terms):
+        self.terms = sorted({t.lower() for t in terms if t and t.strip()}, key=len, reverse=True)
+        self.automaton = None
+        self.regex = None
+        if not self.terms: return
+        if ahocorasick:
+            self.automaton = ahocorasick.Automaton()
+            for term in self.terms: self.automaton.add_word(term, term)
+            self.automaton.make_automaton()
+        else:
+            self.regex = re.compile("|".join(re.escape(t) for t in self.terms))
+
+    def match(self, text):
+        """First blacklisted term found in `text` (already lowercased), else None."""
+        if not text: return None
+        if self.automaton is not None:
+            for _, term in self.automaton.iter(text): return term
+            return None
+        if self.regex is not None:
+            m = self.regex.search(text)
+            return m.group(0) if m else None
+        return None
+
+    def hits(self, title, employer):
+        return bool(self.match(title) or self.match(employer))
+
+_compiled = {}
+
+def compile_terms(terms):
+    """Memoized per term set; worker processes and the server each build it once."""
+    key = tuple(sorted(terms))
+    matcher = _compiled.get(key)
+    if matcher is None:
+        _compiled.clear()
+        matcher = _compiled[key] = BlacklistMatcher(terms)
+    return matcher
+
+def apply(matcher, conn=None):
+    """Streams the jobs table once and flips every match to AUTO_DENIED in one transaction.
+    APPROVED jobs are left alone, as in the original LIKE sweep. Returns the changed count."""
+    if not matcher.terms: return 0
+    own = conn is None
+    if own: conn = db_engine.connect(DB_FILE)
+    try:
+        cur = conn.execute("SELECT id, title, company FROM jobs WHERE status != 'APPROVED' AND status != 'AUTO_DENIED'")
+        hits = []
+        while True:
+            rows = cur.fetchmany(SCAN_BATCH)
+            if not rows: break
+            for jid, title, company in rows:
+                if matcher.hits((title or "").lower(), (company or "").lower()): hits.append((jid,))
+        with conn:
+            conn.executemany("UPDATE jobs SET status='AUTO_DENIED' WHERE id=?", hits)
+        return len(hits)
+    finally:
+        if own: conn.close()
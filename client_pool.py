@@ -0,0 +1,150 @@
+import os
+import time
+import atexit
+import asyncio
+import threading
+import contextvars
+import httpx
+from groq import Groq, AsyncGroq
+
+# --- CONFIG ---
+IDLE_TTL = float(os.getenv("CLIENT_IDLE_TTL", "300"))
+# Non-streamed completions send no header until generation ends, so reads need a generation's worth of time
+PROXY_READ_TIMEOUT = float(os.getenv("PROXY_READ_TIMEOUT", "90"))
+# A dead proxy should fail in the handshake, not after the full read timeout
+PROXY_CONNECT_TIMEOUT = float(os.getenv("PROXY_CONNECT_TIMEOUT", "3"))
+
+try:
+    import h2  # noqa: F401  (httpx needs it for http2=True)
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+# A ContextVar rather than a thread-local: each worker thread and each asyncio task gets its own
+_timing = contextvars.ContextVar("strike_timing", default=None)
+
+# --- TIMING ---
+# httpcore emits paired "<phase>.started"/"<phase>.complete" trace events. We bucket them
+# so every strike can report where its wall-clock time actually went.
+PHASES = {
+    "connection.connect_tcp": "connect",
+    "connection.start_tls": "tls",
+    "http11.send_request_headers": "ttfb", "http2.send_request_headers": "ttfb",
+    "http11.send_request_body": "ttfb", "http2.send_request_body": "ttfb",
+    "http11.receive_response_headers": "ttfb", "http2.receive_response_headers": "ttfb",
+    "http11.receive_response_body": "generation", "http2.receive_response_body": "generation",
+}
+
+def _trace(event_name, info):
+    timing = _timing.get()
+    if timing is None: return
+    phase_key, _, edge = event_name.rpartition(".")
+    phase = PHASES.get(phase_key)
+    if not phase: return
+    now = time.perf_counter()
+    if edge == "started":
+        timing['open'][phase_key] = now
+    elif edge == "complete" and phase_key in timing['open']:
+        timing[phase] += now - timing['open'].pop(phase_key)
+
+async def _atrace(event_name, info):
+    _trace(event_name, info)  # the async httpcore transport awaits its trace callback
+
+def _attach_trace(request):
+    request.extensions['trace'] = _trace
+
+async def _attach_atrace(request):
+    request.extensions['trace'] = _atrace
+
+def start_timing():
+    _timing.set({"t0": time.perf_counter(), "open": {}, "connect": 0.0, "tls": 0.0, "ttfb": 0.0, "generation": 0.0})
+
+def finish_timing():
+    """connect/tls: handshakes (0 when a pooled connection was reused).
+    ttfb: request sent -> response headers; for non-streamed completions this includes generation.
+    generation: response body transfer; the token stream when stream=True."""
+    timing = _timing.get()
+    _timing.set(None)
+    if timing is None: return {}
+    out = {k: round(timing[k], 3) for k in ("connect", "tls", "ttfb", "generation")}
+    out['total'] = round(time.perf_counter() - timing['t0'], 3)
+    out['reused'] = timing['connect'] == 0.0
+    return out
+
+# --- POOL ---
+class ClientPool:
+    """Long-lived Groq clients keyed by (api key, route). route=None means DIRECT."""
+    def __init__(self, idle_ttl=IDLE_TTL):
+        self.idle_ttl = idle_ttl
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def _build(self, key, route):
+        limits = httpx.Limits(max_keepalive_connections=10, keepalive_expiry=self.idle_ttl)
+        hooks = {"request": [_attach_trace]}
+        if route:
+            timeout = httpx.Timeout(PROXY_READ_TIMEOUT, connect=PROXY_CONNECT_TIMEOUT)
+            http = httpx.Client(proxy=route, timeout=timeout, http2=HTTP2, limits=limits, event_hooks=hooks)
+        else:
+            http = httpx.Client(http2=HTTP2, limits=limits, event_hooks=hooks)
+        # max_retries=0: KeyDeck and ProxyPool own retries, on a different key/route, not the SDK
+        return {"groq": Groq(api_key=key, http_client=http, max_retries=0), "http": http, "last_used": time.time()}
+
+    def get(self, key, route=None):
+        with self.lock:
+            self._evict_idle()
+            entry = self.entries.get((key, route))
+            if entry is None:
+                entry = self.entries[(key, route)] = self._build(key, route)
+            entry['last_used'] = time.time()
+            return entry['groq']
+
+    def _evict_idle(self):
+        now = time.time()
+        for ident in [k for k, e in self.entries.items() if now - e['last_used'] > self.idle_ttl]:
+            self._close(self.entries.pop(ident))
+
+    def _close(self, entry):
+        try: entry['http'].close()
+        except Exception as e: print(f"[!] CLIENT POOL: close failed: {e}")
+
+    def close_all(self):
+        with self.lock:
+            for entry in self.entries.values(): self._close(entry)
+            self.entries.clear()
+
+pool = ClientPool()
+atexit.register(pool.close_all)
+
+# --- ASYNC POOL ---
+class AsyncClientPool(ClientPool):
+    """AsyncGroq counterpart for the ASGI server. Same keying and idle eviction; must be used
+    from the event loop that created the clients."""
+    def __init__(self, idle_ttl=IDLE_TTL):
+        super().__init__(idle_ttl)
+        self.closing = set()  # aclose() tasks for evicted clients; held so they aren't collected mid-close
+
+    def _build(self, key, route):
+        limits = httpx.Limits(max_keepalive_connections=50, keepalive_expiry=self.idle_ttl)
+        hooks = {"request": [_attach_atrace]}
+        if route:
+            timeout = httpx.Timeout(PROXY_READ_TIMEOUT, connect=PROXY_CONNECT_TIMEOUT)
+            http = httpx.AsyncClient(proxy=route, timeout=timeout, http2=HTTP2, limits=limits, event_hooks=hooks)
+        else:
+            http = httpx.AsyncClient(http2=HTTP2, limits=limits, event_hooks=hooks)
+        return {"groq": AsyncGroq(api_key=key, http_client=http, max_retries=0), "http": http, "last_used": time.time()}
+
+    def _close(self, entry):
+        try: task = asyncio.get_running_loop().create_task(entry['http'].aclose())
+        except RuntimeError: return  # loop already gone; the process is exiting
+        self.closing.add(task)
+        task.add_done_callback(self.closing.discard)
+
+    async def aclose_all(self):
+        with self.lock:
+            entries, self.entries = list(self.entries.values()), {}
+        for entry in entries:
+            try: await entry['http'].aclose()
+            except Exception as e: print(f"[!] CLIENT POOL: close failed: {e}")
+
+apool = AsyncClientPool()
@@ -0,0 +1,148 @@
+import os
+import copy
+import json
+import atexit
+import threading
+from contextlib import contextmanager
+
+# --- CONFIG ---
+TAGS_FILE = 'categorized_tags.json'
+BLACKLIST_FILE = 'blacklist.json'
+RESUME_FILE = 'master_resume.txt'
+PROMPTS_FILE = 'user_prompts.json'
+HISTORY_FILE = 'job_history.json'
+HISTORY_FLUSH_SECS = float(os.getenv("HISTORY_FLUSH_SECS", "5"))
+HISTORY_FLUSH_EVENTS = int(os.getenv("HISTORY_FLUSH_EVENTS", "50"))
+
+def atomic_write(filename, text):
+    tmp = f"{filename}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, 'w') as f: f.write(text)
+    os.replace(tmp, filename)
+
+class ConfigFile:
+    """A config file parsed once and held in memory.
+    Every get() costs one stat(); the file is re-parsed only when its mtime/size moves,
+    so hand edits still apply live. Treat returned objects as read-only; mutate via edit()."""
+    def __init__(self, filename, default, kind='json', derive=None):
+        self.filename = filename
+        self.default = default
+        self.kind = kind
+        self.derive = derive or {}
+        self.lock = threading.RLock()
+        self.stamp = None
+        self.data = None
+        self.derived = {}
+        self.version = 0
+
+    def _stamp(self):
+        try:
+            st = os.stat(self.filename)
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def _parse(self):
+        try:
+            with open(self.filename, 'r') as f:
+                return json.load(f) if self.kind == 'json' else f.read()
+        except Exception:
+            return copy.deepcopy(self.default)
+
+    def _install(self, data, stamp):
+        self.data = data
+        self.stamp = stamp
+        self.derived = {name: fn(data) for name, fn in self.derive.items()}
+        self.version += 1
+
+    def refresh(self):
+        stamp = self._stamp()
+        with self.lock:
+            if self.data is None or stamp != self.stamp:
+                self._install(self._parse(), stamp)
+
+    def get(self):
+        self.refresh()
+        return self.data
+
+    def view(self, name):
+        """Precomputed structure built from the current contents (see derive=)."""
+        self.refresh()
+        return self.derived[name]
+
+    def save(self, data):
+        with self.lock:
+            text = json.dumps(data, indent=2) if self.kind == 'json' else data
+            atomic_write(self.filename, text)
+            self._install(data, self._stamp())
+
+    @contextmanager
+    def edit(self):
+        """Read-modify-write under the store lock, persisted atomically on exit."""
+        with self.lock:
+            data = copy.deepcopy(self.get())
+            yield data
+            self.save(data)
+
+# --- DERIVED VIEWS ---
+def build_category_map(tags_db):
+    category_map = {}
+    for cat, items in tags_db.items():
+        for item in items: category_map[item.lower()] = cat
+    return category_map
+
+TAGS = ConfigFile(TAGS_FILE, {"qualifications": [], "skills": [], "benefits": [], "ignored": []},
+                  derive={"category_map": build_category_map})
+BLACKLIST = ConfigFile(BLACKLIST_FILE, [], derive={"lowered": lambda bl: [x.lower() for x in bl]})
+RESUME = ConfigFile(RESUME_FILE, "Master resume not found.", kind='text')
+PROMPTS = ConfigFile(PROMPTS_FILE, {})
+HISTORY = ConfigFile(HISTORY_FILE, {"all_time": {}})
+
+# --- HISTORY COUNTERS ---
+class HistoryCounters:
+    """Accumulates all-time counter bumps in memory; a background writer folds them into
+    the history file every `every` seconds or `max_events` bumps, and once more at exit."""
+    def __init__(self, store, every=HISTORY_FLUSH_SECS, max_events=HISTORY_FLUSH_EVENTS):
+        self.store = store
+        self.every = every
+        self.max_events = max_events
+        self.pending = {}
+        self.events = 0
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.thread = threading.Thread(target=self._loop, name="history-writer", daemon=True)
+        self.thread.start()
+        atexit.register(self.flush)
+
+    def add(self, key, amount=1):
+        with self.lock:
+            self.pending[key] = self.pending.get(key, 0) + amount
+            self.events += 1
+            if self.events >= self.max_events: self.wake.set()
+
+    def totals(self):
+        with self.lock:
+            out = dict(self.store.get().get("all_time", {}))
+            for key, amount in self.pending.items(): out[key] = out.get(key, 0) + amount
+            return out
+
+    def flush(self):
+        with self.lock:
+            if not self.pending: return
+            pending, self.pending, self.events = self.pending, {}, 0
+            try:
+                with self.store.edit() as h:
+                    if "all_time" not in h: h["all_time"] = {}
+                    for key, amount in pending.items():
+                        h["all_time"][key] = h["all_time"].get(key, 0) + amount
+            except Exception as e:
+                # Keep the bumps for the next attempt rather than dropping them
+                for key, amount in pending.items(): self.pending[key] = self.pending.get(key, 0) + amount
+                print(f"[!] HISTORY FLUSH FAILED: {e}")
+
+    def _loop(self):
+        while True:
+            self.wake.wait(self.every)
+            self.wake.clear()
+            self.flush()
+
+COUNTERS = HistoryCounters(HISTORY)
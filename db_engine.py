@@ -0,0 +1,295 @@
+import os
+import queue
+import asyncio
+import sqlite3
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+import artifact_engine
+
+# --- CONFIG ---
+DB_FILE = 'jobs.db'
+MMAP_SIZE = int(os.getenv("SQLITE_MMAP_MB", "256")) * 1024 * 1024
+BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "10000"))
+POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "16"))
+STATEMENT_CACHE = int(os.getenv("SQLITE_STATEMENT_CACHE", "256"))  # prepared statements kept per connection
+WRITE_BATCH_MAX = 500
+
+_migrated = set()
+_migrate_lock = threading.Lock()
+
+# --- MIGRATIONS ---
+# Each step runs once, in order, inside a transaction; PRAGMA user_version records progress.
+# Append new steps; never edit one that has shipped.
+def _v1_base(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS jobs
+                 (id TEXT PRIMARY KEY, title TEXT, company TEXT, city TEXT,
+                  state TEXT, date_posted INTEGER, annual_pay INTEGER,
+                  pay_fmt TEXT, score INTEGER, raw_json TEXT, status TEXT)''')
+
+def _v2_listing(conn):
+    cols = {r[1] for r in conn.execute("PRAGMA table_info(jobs)")}
+    if 'url' not in cols: conn.execute("ALTER TABLE jobs ADD COLUMN url TEXT")
+    if 'desc_len' not in cols: conn.execute("ALTER TABLE jobs ADD COLUMN desc_len INTEGER")
+    conn.execute("""UPDATE jobs SET
+        url = COALESCE(json_extract(raw_json, '$.url'), json_extract(raw_json, '$.link'), json_extract(raw_json, '$.jobUrl')),
+        desc_len = length(COALESCE(json_extract(raw_json, '$.description.text'), ''))""")
+    conn.execute("UPDATE jobs SET status='NEW' WHERE status IS NULL")
+    # Covers the tab filters and ORDER BY score DESC, date_posted ASC without touching raw_json pages
+    conn.execute("""CREATE INDEX IF NOT EXISTS idx_jobs_listing
+                    ON jobs(status, score DESC, date_posted, id, title, company, city, pay_fmt, url)""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_fresh ON jobs(date_posted)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_pay ON jobs(annual_pay)")
+
+def _v3_artifacts(conn):
+    conn.execute("""CREATE TABLE IF NOT EXISTS artifacts
+                 (job_id TEXT PRIMARY KEY, dir TEXT, has_ai INTEGER DEFAULT 0, has_pdf INTEGER DEFAULT 0,
+                  ai_path TEXT, pdf_path TEXT, ai_at REAL, pdf_at REAL)""")
+    rows = artifact_engine.rebuild(conn)  # seed once from what is already on disk
+    print(f"[*] DB ENGINE: indexed {len(rows)} existing artifact folders")
+
+def _v4_change_counter(conn):
+    # Bumped by triggers on anything a listing shows; /api/jobs uses it as its ETag
+    conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)")
+    conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('jobs_version', 0)")
+    bump = "BEGIN UPDATE meta SET value = value + 1 WHERE key = 'jobs_version'; END"
+    listed = "status, score, date_posted, title, company, city, pay_fmt, url"
+    for table, cols in (("jobs", listed), ("artifacts", "has_ai, has_pdf, dir")):
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {table}_ver_ins AFTER INSERT ON {table} {bump}")
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {table}_ver_upd AFTER UPDATE OF {cols} ON {table} {bump}")
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {table}_ver_del AFTER DELETE ON {table} {bump}")
+
+def _v5_search(conn):
+    conn.execute("""CREATE VIRTUAL TABLE IF NOT EXISTS jobs_fts USING fts5(
+                        id UNINDEXED, title, company, city, description, tags,
+                        tokenize='porter unicode61')""")
+    conn.execute("DELETE FROM jobs_fts")
+    conn.execute("""INSERT INTO jobs_fts (id, title, company, city, description, tags)
+                    SELECT id, title, company, city,
+                           COALESCE(json_extract(raw_json, '$.description.text'), ''),
+                           COALESCE((SELECT group_concat(value, ' ') FROM json_each(raw_json, '$.attributes')), '')
+                    FROM jobs""")
+
+def _v6_scoring(conn):
+    # scored=0 marks rows score_engine has not seen yet; incremental passes only read those
+    cols = {r[1] for r in conn.execute("PRAGMA table_info(jobs)")}
+    if 'scored' not in cols: conn.execute("ALTER TABLE jobs ADD COLUMN scored INTEGER DEFAULT 0")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_unscored ON jobs(scored) WHERE scored = 0")
+
+def _v7_text_meta(conn):
+    # meta.value is INTEGER (the change counter); score_engine's fingerprint and model JSON are text
+    conn.execute("CREATE TABLE IF NOT EXISTS meta_text (key TEXT PRIMARY KEY, value TEXT)")
+    conn.execute("""INSERT OR REPLACE INTO meta_text (key, value)
+                    SELECT key, CAST(value AS TEXT) FROM meta WHERE key IN ('score_inputs', 'score_model')""")
+    conn.execute("DELETE FROM meta WHERE key IN ('score_inputs', 'score_model')")
+
+MIGRATIONS = [
+    (1, _v1_base),
+    (2, _v2_listing),
+    (3, _v3_artifacts),
+    (4, _v4_change_counter),
+    (5, _v5_search),
+    (6, _v6_scoring),
+    (7, _v7_text_meta),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def migrate(conn):
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version >= SCHEMA_VERSION: return version
+    conn.execute("PRAGMA journal_mode=WAL")  # persistent; lets readers run during batch writes
+    for step, fn in MIGRATIONS:
+        if step <= version: continue
+        print(f"[*] DB ENGINE: applying schema v{step} ({fn.__name__})")
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            fn(conn)
+            conn.execute(f"PRAGMA user_version={step}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    conn.execute("ANALYZE")
+    return SCHEMA_VERSION
+
+# --- CONNECTIONS ---
+def connect(path=DB_FILE, **kwargs):
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000, cached_statements=STATEMENT_CACHE, **kwargs)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA synchronous=NORMAL")  # safe under WAL, skips an fsync per commit
+    conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    key = os.path.abspath(path)
+    if key not in _migrated:
+        with _migrate_lock:
+            if key not in _migrated:
+                migrate(conn)
+                _migrated.add(key)
+    return conn
+
+# --- POOL ---
+class PooledConnection(sqlite3.Connection):
+    """Pool member. close() hands it back rather than closing it, so call sites keep their
+    get_db()/close() shape while pragmas and the statement cache survive between requests."""
+    pool = None
+
+    def close(self):
+        pool, self.pool = self.pool, None
+        if pool is not None: pool.release(self)
+
+    def __del__(self):
+        # Dropped without close() (an exception between get_db and close): free its slot
+        if self.pool is not None: self.pool.forget()
+
+class ConnectionPool:
+    """Bounded pool of connections to one database, handed out LIFO so the warmest one goes first.
+    Connections move between threads, but only ever belong to one at a time."""
+    def __init__(self, path=DB_FILE, size=POOL_SIZE):
+        self.path = path
+        self.size = size
+        self.idle = queue.LifoQueue()
+        self.open = 0
+        self.lock = threading.Lock()
+
+    def acquire(self, timeout=BUSY_TIMEOUT_MS / 1000):
+        try:
+            conn = self.idle.get_nowait()
+        except queue.Empty:
+            with self.lock:
+                grow = self.open < self.size
+                if grow: self.open += 1
+            if grow:
+                try: conn = connect(self.path, factory=PooledConnection, check_same_thread=False)
+                except Exception:
+                    self.forget()
+                    raise
+            else:
+                try: conn = self.idle.get(timeout=timeout)
+                except queue.Empty: raise sqlite3.OperationalError(f"connection pool exhausted ({self.size} in use)")
+        conn.pool = self
+        return conn
+
+    def release(self, conn):
+        try:
+            if conn.in_transaction: conn.rollback()  # never hand the next caller someone else's half-done work
+            conn.row_factory = sqlite3.Row
+        except sqlite3.Error:
+            self.forget()
+            sqlite3.Connection.close(conn)
+            return
+        self.idle.put(conn)
+
+    def forget(self):
+        with self.lock: self.open -= 1
+
+    def close_all(self):
+        while True:
+            try: sqlite3.Connection.close(self.idle.get_nowait())
+            except queue.Empty: return
+            self.forget()
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def acquire(path=DB_FILE):
+    """A pooled connection to `path`; close() returns it to the pool."""
+    key = os.path.abspath(path)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.setdefault(key, ConnectionPool(path))
+    return pool.acquire()
+
+# --- WRITE QUEUE ---
+class WriteQueue:
+    """One writer thread for small hot writes (job status flips). Everything queued while the
+    previous commit ran goes into the next transaction together, so a burst of triage clicks or
+    batch deliveries costs one commit and those writers never fight each other for the lock."""
+    def __init__(self, path=DB_FILE):
+        self.path = path
+        self.q = queue.Queue()
+        self.thread = threading.Thread(target=self._loop, name="db-writer", daemon=True)
+        self.thread.start()
+
+    def submit(self, sql, params=()):
+        """Future resolving to the statement's rowcount once its transaction commits."""
+        fut = Future()
+        self.q.put((sql, params, fut))
+        return fut
+
+    def execute(self, sql, params=(), timeout=None):
+        return self.submit(sql, params).result(timeout)
+
+    def _commit(self, conn, batch):
+        done = []
+        with conn:
+            for sql, params, fut in batch:
+                # A failing statement is rolled back on its own; the rest of the group still commits
+                try: done.append((fut, conn.execute(sql, params).rowcount, None))
+                except sqlite3.Error as e: done.append((fut, None, e))
+        for fut, rowcount, err in done:
+            if err: fut.set_exception(err)
+            else: fut.set_result(rowcount)
+
+    def _loop(self):
+        conn = None
+        while True:
+            batch = [self.q.get()]
+            while len(batch) < WRITE_BATCH_MAX:
+                try: batch.append(self.q.get_nowait())
+                except queue.Empty: break
+            try:
+                if conn is None: conn = connect(self.path)
+                self._commit(conn, batch)
+            except Exception as e:
+                print(f"[!] DB WRITER: group of {len(batch)} failed: {e}")
+                for _, _, fut in batch:
+                    if not fut.done(): fut.set_exception(e)
+                if conn is not None: conn.close()
+                conn = None  # reconnect on the next group
+
+_writers = {}
+
+def writes(path=DB_FILE):
+    """The write queue for `path`, started on first use."""
+    key = os.path.abspath(path)
+    if key not in _writers:
+        with _pools_lock:
+            if key not in _writers: _writers[key] = WriteQueue(path)
+    return _writers[key]
+
+# --- ASYNC ---
+class AsyncDB:
+    """SQLite for the event loop. One connection, owned by one worker thread: every call is
+    queued onto it and the loop only awaits the result, so a slow query never stalls it."""
+    def __init__(self, path=DB_FILE):
+        self.path = path
+        self.pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="adb")
+        self.conn = None
+
+    def _call(self, fn, args):
+        if self.conn is None: self.conn = connect(self.path)  # opened on the thread that will use it
+        return fn(self.conn, *args)
+
+    async def run(self, fn, *args):
+        """Runs fn(conn, *args) on the DB thread."""
+        return await asyncio.get_running_loop().run_in_executor(self.pool, self._call, fn, args)
+
+    async def fetchone(self, sql, params=()):
+        return await self.run(lambda conn: conn.execute(sql, params).fetchone())
+
+    async def fetchall(self, sql, params=()):
+        return await self.run(lambda conn: conn.execute(sql, params).fetchall())
+
+    async def execute(self, sql, params=()):
+        """Single statement in its own transaction; returns the rowcount."""
+        def write(conn):
+            with conn: return conn.execute(sql, params).rowcount
+        return await self.run(write)
+
+    def close(self):
+        def shut():
+            if self.conn is not None: self.conn.close()
+            self.conn = None
+        self.pool.submit(shut)
+        self.pool.shutdown(wait=True)
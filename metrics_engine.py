@@ -0,0 +1,171 @@
+import os
+import json
+import math
+import time
+import queue
+import atexit
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# --- CONFIG ---
+# Kept out of jobs.db so span writes never contend with the job tables
+METRICS_DB = os.getenv("METRICS_DB", "metrics.db")
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+FLUSH_SECS = float(os.getenv("METRICS_FLUSH_SECS", "1"))
+FLUSH_ROWS = 500
+QUEUE_MAX = 50000
+PERCENTILES = (50, 95, 99)
+
+COLUMNS = ("ts", "trace", "stage", "ms", "ok", "job_id", "model", "key", "route", "tokens_in", "tokens_out", "extra")
+
+def connect(path=METRICS_DB):
+    conn = sqlite3.connect(path, timeout=10)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("""CREATE TABLE IF NOT EXISTS spans
+                 (ts REAL, trace TEXT, stage TEXT, ms REAL, ok INTEGER, job_id TEXT, model TEXT,
+                  key TEXT, route TEXT, tokens_in INTEGER, tokens_out INTEGER, extra TEXT)""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_spans_ts ON spans(ts)")
+    return conn
+
+# --- WRITER ---
+class SpanWriter:
+    """Spans go on a queue and a background thread writes them in batches, so the hot path
+    pays for a put() and nothing else. If the writer falls behind, spans are dropped, never waited on."""
+    def __init__(self, path=METRICS_DB):
+        self.path = path
+        self.q = queue.Queue(maxsize=QUEUE_MAX)
+        self.dropped = 0
+        self.thread = threading.Thread(target=self._loop, name="metrics-writer", daemon=True)
+        self.thread.start()
+        atexit.register(self.flush)
+
+    def put(self, row):
+        try: self.q.put_nowait(row)
+        except queue.Full: self.dropped += 1
+
+    def _drain(self):
+        rows = []
+        while len(rows) < FLUSH_ROWS * 10:
+            try: rows.append(self.q.get_nowait())
+            except queue.Empty: break
+        return rows
+
+    def _write(self, conn, rows):
+        if not rows: return
+        conn.executemany(f"INSERT INTO spans ({', '.join(COLUMNS)}) VALUES ({','.join('?' * len(COLUMNS))})", rows)
+        conn.commit()
+
+    def flush(self):
+        try:
+            conn = connect(self.path)
+            self._write(conn, self._drain())
+            conn.close()
+        except Exception as e:
+            print(f"[!] METRICS FLUSH FAILED: {e}")
+
+    def _loop(self):
+        conn = None
+        while True:
+            try:
+                first = self.q.get()
+                rows = [first] + self._drain()
+                if len(rows) < FLUSH_ROWS: time.sleep(FLUSH_SECS)  # let a burst coalesce into one commit
+                rows += self._drain()
+                if conn is None: conn = connect(self.path)
+                self._write(conn, rows)
+            except Exception as e:
+                print(f"[!] METRICS WRITER: {e}")
+                conn = None
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None: _writer = SpanWriter()
+    return _writer
+
+def record(stage, ms, ok=True, trace=None, job_id=None, model=None, key=None, route=None,
+           tokens_in=None, tokens_out=None, **extra):
+    if not METRICS_ENABLED: return
+    writer().put((time.time(), trace, stage, round(ms, 3), int(bool(ok)), job_id, model, key, route,
+                  tokens_in, tokens_out, json.dumps(extra) if extra else None))
+
+# --- TRACES ---
+class Trace:
+    """One strike's worth of spans. key/route are filled in once known and stamped on every
+    span recorded after that."""
+    def __init__(self, job_id=None, model=None):
+        self.id = f"{job_id}_{int(time.time() * 1000)}"
+        self.job_id = job_id
+        self.model = model
+        self.key = None
+        self.route = None
+
+    def tag(self, key=None, route=None):
+        if key is not None: self.key = key
+        if route is not None: self.route = route
+
+    def add(self, stage, ms, ok=True, **fields):
+        record(stage, ms, ok, trace=self.id, job_id=self.job_id, model=self.model,
+               key=self.key, route=self.route, **fields)
+
+    @contextmanager
+    def span(self, stage, **fields):
+        """Times the block; fields may be added to the yielded dict before it closes."""
+        start = time.perf_counter()
+        ok = True
+        try:
+            yield fields
+        except BaseException:
+            ok = False
+            raise
+        finally:
+            self.add(stage, (time.perf_counter() - start) * 1000, ok, **fields)
+
+# --- REPORTING ---
+def percentile(sorted_vals, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_vals: return None
+    k = max(0, min(len(sorted_vals) - 1, math.ceil(p / 100 * len(sorted_vals)) - 1))
+    return sorted_vals[k]
+
+def summary(since_secs=86400, group_by=("stage", "model", "key", "route"), stage=None):
+    """p50/p95/p99 of span durations over the window, one row per group."""
+    group_by = [g for g in group_by if g in ("stage", "model", "key", "route")] or ["stage"]
+    if "stage" not in group_by: group_by.insert(0, "stage")
+    conn = connect()
+    try:
+        sql = f"""SELECT {', '.join(group_by)}, ms, ok, tokens_in, tokens_out, json_extract(extra, '$.cached_tokens')
+                  FROM spans WHERE ts >= ?"""
+        args = [time.time() - since_secs]
+        if stage:
+            sql += " AND stage = ?"
+            args.append(stage)
+        groups = {}
+        for row in conn.execute(sql, args):
+            g = groups.setdefault(tuple(row[:len(group_by)]), {"ms": [], "errors": 0, "tokens_in": 0, "tokens_out": 0, "cached_tokens": 0})
+            ms, ok, t_in, t_out, cached = row[len(group_by):]
+            g["ms"].append(ms)
+            if not ok: g["errors"] += 1
+            g["tokens_in"] += t_in or 0
+            g["tokens_out"] += t_out or 0
+            g["cached_tokens"] += cached or 0
+    finally:
+        conn.close()
+    out = []
+    for k, g in groups.items():
+        vals = sorted(g["ms"])
+        entry = dict(zip(group_by, k))
+        entry.update({"count": len(vals), "errors": g["errors"], "mean_ms": round(sum(vals) / len(vals), 2)})
+        for p in PERCENTILES: entry[f"p{p}_ms"] = round(percentile(vals, p), 2)
+        if g["tokens_in"] or g["tokens_out"]:
+            entry.update(tokens_in=g["tokens_in"], tokens_out=g["tokens_out"], cached_tokens=g["cached_tokens"],
+                         cache_hit_rate=round(g["cached_tokens"] / g["tokens_in"], 3) if g["tokens_in"] else None)
+        out.append(entry)
+    out.sort(key=lambda e: (e["stage"], -e["p95_ms"]))
+    return out
@@ -1,11 +1,27 @@
-import sqlite3
 import json
 import os
+import queue
+import multiprocessing
 from datetime import datetime, timezone
 import dateutil.parser
+import config_store
+import blacklist_engine
+import db_engine
+import score_engine
 
-DB_FILE = "jobs.db"
-BLACKLIST_FILE = "blacklist.json"
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+DB_FILE = db_engine.DB_FILE
+INSERT_SQL = """INSERT OR IGNORE INTO jobs
+    (id, title, company, city, state, date_posted, annual_pay, pay_fmt, score, raw_json, status, url, desc_len)
+    VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)"""
+FTS_SQL = "INSERT INTO jobs_fts (id, title, company, city, description, tags) VALUES (?,?,?,?,?,?)"
+CHUNK_SIZE = int(os.getenv("MIGRATION_CHUNK_SIZE", "2000"))
+WORKERS = int(os.getenv("MIGRATION_WORKERS", "0")) or os.cpu_count() or 1
+READ_SIZE = 1 << 20
 
 def calc_freshness(job):
     try:
@@ -35,83 +51,247 @@ def normalize_pay(job):
         return int(annual), f"${int(annual/1000)}k" if annual > 10000 else f"${int(val)}/hr"
     except: return 0, "-"
 
-def process_files(file_list):
-    print(f"--- STARTING MIGRATION ON {len(file_list)} FILES ---")
-    
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    
-    # Ensure table exists
-    c.execute('''CREATE TABLE IF NOT EXISTS jobs
-                 (id TEXT PRIMARY KEY, title TEXT, company TEXT, city TEXT, 
-                  state TEXT, date_posted INTEGER, annual_pay INTEGER, 
-                  pay_fmt TEXT, score INTEGER, raw_json TEXT, status TEXT)''')
+# --- STREAMING READER ---
+class JsonStream:
+    """Incremental reader for one big JSON document, built on JSONDecoder.raw_decode.
+    Only the value currently being decoded has to fit in memory."""
+    def __init__(self, f):
+        self.f = f
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        # Read at least as much as we already hold so retries on a huge value stay linear
+        data = self.f.read(max(READ_SIZE, len(self.buf) - self.pos))
+        if not data: self.eof = True
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n": self.pos += 1
+            if self.pos < len(self.buf): return self.buf[self.pos]
+            if self.eof: return ""
+            self._fill()
+
+    def expect(self, ch):
+        if self.peek() != ch: raise ValueError(f"Expected '{ch}' at offset {self.pos}")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                val, end = self.decoder.raw_decode(self.buf, self.pos)
+                # A number cut off at the buffer edge still decodes; make sure it really ended
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return val
+            except ValueError:
+                if self.eof: raise
+            self._fill()
+
+    def array(self):
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            sep = self.peek()
+            self.pos += 1
+            if sep == "]": return
+            if sep != ",": raise ValueError(f"Malformed array near offset {self.pos}")
+
+def iter_jobs(filename):
+    """Yields jobs one at a time from either a raw list or a {jobs: []} scrape file."""
+    if ijson:
+        with open(filename, 'rb') as f:
+            head = f.read(64).lstrip()
+            f.seek(0)
+            prefix = 'item' if head[:1] == b'[' else 'jobs.item'
+            yield from ijson.items(f, prefix, use_float=True)
+        return
+
+    with open(filename, 'r', encoding='utf-8') as f:
+        js = JsonStream(f)
+        if js.peek() == "[":
+            yield from js.array()
+            return
+        js.expect("{")
+        while js.peek() not in ("}", ""):
+            key = js.value()
+            js.expect(":")
+            if key == "jobs" and js.peek() == "[": yield from js.array()
+            else: js.value()
+            if js.peek() == ",": js.pos += 1
+
+def chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk: yield chunk
+
+# --- INGEST ---
+def normalize_job(job, jid, matcher):
+    """Flattens one scrape record. Returns (jobs row, status, jobs_fts row)."""
+    title = safe_str(job.get('title')).lower()
+    employer = job.get('employer', {}).get('name', '').lower()
+    status = "AUTO_DENIED" if matcher.hits(title, employer) else "NEW"
+
+    freshness = calc_freshness(job)
+    pay_val, pay_fmt = normalize_pay(job)
+    loc = job.get('location') or {}
+    desc = job.get('description') or {}
+    desc_text = (desc.get('text') or '') if isinstance(desc, dict) else ''
+    attrs = job.get('attributes') or {}
+    tags_text = " ".join(safe_str(v) for v in attrs.values()) if isinstance(attrs, dict) else ""
+    real_title = job.get('title', 'Unknown')
+    real_company = job.get('employer', {}).get('name', 'Unknown')
+    city = safe_str(loc.get('city'))
     
-    # Load Blacklist
-    blacklist = []
-    if os.path.exists(BLACKLIST_FILE):
-        with open(BLACKLIST_FILE, 'r') as f: 
-            blacklist = [x.lower() for x in json.load(f)]
+    return (
+        jid,
+        real_title,
+        real_company,
+        city,
+        safe_str(loc.get('admin1Code')),
+        freshness,
+        pay_val,
+        pay_fmt,
+        50, 
+        json.dumps(job),
+        status,
+        job.get('url') or job.get('link') or job.get('jobUrl'),
+        len(desc_text)
+    ), status, (jid, real_title, real_company, city, desc_text, tags_text)
 
-    stats = {"new": 0, "skipped": 0, "blacklisted": 0, "files": 0}
+def existing_ids(c, ids):
+    found = set()
+    for i in range(0, len(ids), 900):
+        part = ids[i:i + 900]
+        rows = c.execute(f"SELECT id FROM jobs WHERE id IN ({','.join('?' * len(part))})", part)
+        found.update(r[0] for r in rows)
+    return found
 
-    for filename in file_list:
-        if not os.path.exists(filename): continue
-        print(f"Processing {filename}...")
+# --- PARSE WORKERS ---
+_seq = 0
+
+def parse_file(filename, blacklist):
+    """Yields lists of normalize_job results for one scrape file.
+    CPU-heavy (JSON, dateutil, pay math), so it runs in the worker processes."""
+    global _seq
+    matcher = blacklist_engine.compile_terms(blacklist)
+    for chunk in chunked(iter_jobs(filename), CHUNK_SIZE):
+        stamp = int(datetime.now().timestamp())
+        out = []
+        for job in chunk:
+            jid = job.get('key')
+            if not jid: jid = f"job_{os.getpid()}_{_seq}_{stamp}"
+            _seq += 1
+            out.append(normalize_job(job, jid, matcher))
+        yield out
+
+def _parse_worker(tasks, results, blacklist):
+    while True:
+        filename = tasks.get()
+        if filename is None: return
         try:
-            with open(filename, 'r', encoding='utf-8') as f:
-                content = json.load(f)
-                # Handle both raw list and {jobs: []} format
-                jobs = content if isinstance(content, list) else content.get('jobs', [])
+            for rows in parse_file(filename, blacklist):
+                results.put(("rows", filename, rows))
+            results.put(("done", filename, None))
         except Exception as e:
-            print(f"Error reading {filename}: {e}")
-            continue
+            results.put(("error", filename, str(e)))
 
-        stats["files"] += 1
-        
-        for job in jobs:
-            # Generate ID
-            jid = job.get('key')
-            if not jid: jid = f"job_{stats['new']}_{int(datetime.now().timestamp())}"
-            
-            # Check existing
-            c.execute("SELECT status FROM jobs WHERE id=?", (jid,))
-            row = c.fetchone()
-            if row:
-                stats["skipped"] += 1
+def _parsed_chunks(files, blacklist, workers):
+    """(kind, filename, payload) messages from a process pool, or inline for a single file."""
+    if workers <= 1 or len(files) <= 1:
+        for filename in files:
+            try:
+                for rows in parse_file(filename, blacklist): yield "rows", filename, rows
+                yield "done", filename, None
+            except Exception as e:
+                yield "error", filename, str(e)
+        return
+
+    ctx = multiprocessing.get_context("spawn")  # safe to launch from Flask request threads
+    tasks, results = ctx.Queue(), ctx.Queue(maxsize=workers * 4)
+    for filename in files: tasks.put(filename)
+    procs = [ctx.Process(target=_parse_worker, args=(tasks, results, blacklist), daemon=True)
+             for _ in range(min(workers, len(files)))]
+    for proc in procs:
+        tasks.put(None)
+        proc.start()
+    try:
+        pending = len(files)
+        while pending:
+            try:
+                msg = results.get(timeout=5)
+            except queue.Empty:
+                if not any(proc.is_alive() for proc in procs): raise RuntimeError("Parse workers died")
                 continue
+            if msg[0] != "rows": pending -= 1
+            yield msg
+    finally:
+        for proc in procs:
+            proc.join(timeout=1)
+            if proc.is_alive(): proc.terminate()
+
+# --- WRITER ---
+def write_chunk(c, parsed, stats, fstats):
+    known = existing_ids(c, [row[0] for row, _, _ in parsed])
+    rows, docs = [], []
+    for row, status, doc in parsed:
+        if row[0] in known:
+            fstats["skipped"] += 1
+            continue
+        known.add(row[0])
+        rows.append(row)
+        docs.append(doc)
+        if status == "NEW": fstats["new"] += 1
+        else: fstats["blacklisted"] += 1
+    c.executemany(INSERT_SQL, rows)
+    c.executemany(FTS_SQL, docs)  # search index grows with the same transaction
+    for key in ("new", "skipped", "blacklisted"): stats[key] = sum(f[key] for f in stats["per_file"].values())
+
+def process_files(file_list, progress=None, workers=None):
+    """Parses files in a process pool; this process is the only SQLite writer.
+    progress(per_file) is called after every chunk with the running per-file stats."""
+    print(f"--- STARTING MIGRATION ON {len(file_list)} FILES ---")
+    
+    conn = db_engine.connect(DB_FILE)  # also creates/upgrades the schema
+    c = conn.cursor()
+    
+    # Blacklist terms travel to the workers; each compiles its own matcher once
+    blacklist = config_store.BLACKLIST.view('lowered')
+
+    files = [f for f in dict.fromkeys(file_list) if os.path.exists(f)]
+    stats = {"new": 0, "skipped": 0, "blacklisted": 0, "files": len(files),
+             "per_file": {f: {"state": "QUEUED", "parsed": 0, "new": 0, "skipped": 0, "blacklisted": 0} for f in files}}
 
-            # Check Blacklist
-            title = safe_str(job.get('title')).lower()
-            employer = job.get('employer', {}).get('name', '').lower()
-            status = "NEW"
-            
-            for term in blacklist:
-                if term in title or term in employer:
-                    status = "AUTO_DENIED"
-                    stats["blacklisted"] += 1
-                    break
-
-            # Process fields
-            freshness = calc_freshness(job)
-            pay_val, pay_fmt = normalize_pay(job)
-            loc = job.get('location') or {}
-            
-            c.execute("INSERT INTO jobs VALUES (?,?,?,?,?,?,?,?,?,?,?)", (
-                jid,
-                job.get('title', 'Unknown'),
-                job.get('employer', {}).get('name', 'Unknown'),
-                safe_str(loc.get('city')),
-                safe_str(loc.get('admin1Code')),
-                freshness,
-                pay_val,
-                pay_fmt,
-                50, 
-                json.dumps(job),
-                status
-            ))
-            if status == "NEW": stats["new"] += 1
+    for kind, filename, payload in _parsed_chunks(files, blacklist, workers or WORKERS):
+        fstats = stats["per_file"][filename]
+        if kind == "rows":
+            fstats["state"] = "PARSING"
+            fstats["parsed"] += len(payload)
+            write_chunk(c, payload, stats, fstats)
+            conn.commit()
+        elif kind == "done":
+            fstats["state"] = "DONE"
+            print(f"Processed {filename}: {fstats['parsed']} jobs, {fstats['new']} new")
+        else:
+            fstats["state"] = "ERROR"
+            fstats["error"] = payload
+            print(f"Error reading {filename}: {payload}")
+        if progress: progress(stats["per_file"])
 
     conn.commit()
+    # New rows land with the placeholder score; give them real ones before the UI reloads
+    stats["scored"] = score_engine.rescore(conn) if stats["new"] else 0
     conn.close()
     return stats
@@ -1,93 +1,368 @@
 import os
 import json
-import sqlite3
 import jinja2
 import sys
+import time
+import hashlib
+import atexit
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import db_engine
+import artifact_engine
+import metrics_engine
+import batch_engine
 
 # --- CONFIG ---
-DB_FILE = 'jobs.db'
+DB_FILE = db_engine.DB_FILE
 TEMPLATE_FILE = 'template.html'
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "0")) or os.cpu_count() or 1
+PDF_WAIT_SECS = float(os.getenv("PDF_WAIT_SECS", "120"))
+MAX_BATCHES = 50  # Finished PDF batches kept around for status polling
+MANIFEST_NAME = "resume.pdf.manifest.json"
 
 def get_db():
-    conn = sqlite3.connect(DB_FILE)
-    conn.row_factory = sqlite3.Row
-    return conn
+    return db_engine.acquire(DB_FILE)  # pooled; close() hands it back
 
-def sanitize_filename(text):
-    return "".join(c for c in text if c.isalnum() or c in " -_").strip()[:50]
+sanitize_filename = artifact_engine.sanitize_filename
+
+def job_paths(job_id, title, company):
+    dir_name = artifact_engine.target_dir_name(job_id, title, company)
+    return os.path.join(artifact_engine.TARGETS_DIR, dir_name), dir_name
 
 def get_job_data(job_id):
     """Fetches path AND metadata from DB"""
     conn = get_db()
     row = conn.execute("SELECT title, company FROM jobs WHERE id=?", (job_id,)).fetchone()
     conn.close()
-    
+
     if not row: return None, None, None, None
-    
-    safe_title = sanitize_filename(row['title'])
-    safe_company = sanitize_filename(row['company'])
-    path = f"targets/{safe_title}_{safe_company}_{job_id}"
-    
-    return path, f"{safe_title}_{safe_company}_{job_id}", row['title'], row['company']
-
-def generate_pdf(job_id):
-    print(f"[*] PDF ENGINE: Engaging for Job ID {job_id}...")
-    
-    # 0. Check Dependencies
-    try:
-        from weasyprint import HTML, CSS
-    except ImportError:
-        return {"status": "error", "message": "CRITICAL: 'weasyprint' not installed."}
-
-    # 1. Locate Artifacts & DB Metadata
-    t_dir, dir_name, real_title, real_company = get_job_data(job_id)
-    
-    if not t_dir or not os.path.exists(t_dir):
-        return {"status": "error", "message": "Target directory not found."}
-        
-    json_path = os.path.join(t_dir, "resume.json")
-    pdf_path = os.path.join(t_dir, "resume.pdf")
-    
-    if not os.path.exists(json_path):
-        return {"status": "error", "message": "resume.json artifact missing. Run AI Strike first."}
-        
-    # 2. Load JSON Data
-    try:
-        with open(json_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-    except Exception as e:
-        return {"status": "error", "message": f"JSON Corrupt: {str(e)}"}
-
-    # 3. Load Template
-    if not os.path.exists(TEMPLATE_FILE):
-        return {"status": "error", "message": "template.html missing."}
-        
-    template_loader = jinja2.FileSystemLoader(searchpath="./")
-    template_env = jinja2.Environment(loader=template_loader)
-    template = template_env.get_template(TEMPLATE_FILE)
-
-    # 4. DATA INJECTION (THE FIX)
-    # We FORCE the real title from the database, ignoring the AI or Fallback.
-    data['job_title'] = real_title.upper() if real_title else "PROFESSIONAL TARGET"
-
-    # 5. Render HTML
-    try:
-        html_string = template.render(**data)
-    except Exception as e:
-         return {"status": "error", "message": f"Jinja2 Render Error: {str(e)}"}
 
-    # 6. Write PDF
+    path, dir_name = job_paths(job_id, row['title'], row['company'])
+    return path, dir_name, row['title'], row['company']
+
+def job_meta(conn, job_ids):
+    """{id: row(id, title, company)} in a handful of queries rather than one per job."""
+    meta = {}
+    for i in range(0, len(job_ids), 500):
+        chunk = job_ids[i:i + 500]
+        marks = ",".join("?" * len(chunk))
+        for row in conn.execute(f"SELECT id, title, company FROM jobs WHERE id IN ({marks})", chunk):
+            meta[row['id']] = row
+    return meta
+
+def record_pdf(job_id, t_dir, pdf_path, conn=None):
+    own = conn is None
+    if own: conn = get_db()
+    try: artifact_engine.record(conn, job_id, t_dir, 'pdf', pdf_path)
+    finally:
+        if own: conn.close()
+
+# --- RENDER MANIFEST ---
+# Next to each resume.pdf sits a manifest of the hashes it was rendered from. When the
+# resume JSON, the template (which carries the CSS and font links) and the job title all
+# match, the existing PDF is current and the render is skipped.
+_template_digest = {}
+
+def file_digest(path):
+    with open(path, 'rb') as f: return hashlib.sha256(f.read()).hexdigest()
+
+def template_digest(path):
+    """Hashed once per template edit (keyed on mtime/size), not once per job."""
+    st = os.stat(path)
+    stamp = (path, st.st_mtime_ns, st.st_size)
+    if stamp not in _template_digest:
+        _template_digest.clear()
+        _template_digest[stamp] = file_digest(path)
+    return _template_digest[stamp]
+
+def render_inputs(t_dir, real_title, template_file=TEMPLATE_FILE):
+    return {"resume_json": file_digest(os.path.join(t_dir, "resume.json")),
+            "template": template_digest(template_file),
+            "job_title": hashlib.sha256((real_title or "").encode()).hexdigest()}
+
+def is_current(t_dir, inputs):
     try:
-        HTML(string=html_string, base_url='.').write_pdf(pdf_path)
-        print(f"[*] PDF GENERATED: {pdf_path}")
-        return {"status": "success", "path": f"/done/{dir_name}/resume.pdf"}
-        
-    except Exception as e:
-        print(f"[!] WeasyPrint Error: {e}")
-        return {"status": "error", "message": f"PDF Generation Failed: {str(e)}"}
+        if not os.path.exists(os.path.join(t_dir, "resume.pdf")): return False
+        with open(os.path.join(t_dir, MANIFEST_NAME)) as f:
+            return json.load(f).get("inputs") == inputs
+    except Exception:
+        return False
+
+def write_manifest(t_dir, inputs):
+    path = os.path.join(t_dir, MANIFEST_NAME)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, 'w') as f: json.dump({"inputs": inputs, "rendered_at": time.time()}, f)
+    os.replace(tmp, path)
+
+def up_to_date(t_dir, dir_name, real_title, template_file=TEMPLATE_FILE):
+    """Success dict (skipped=True) when the PDF on disk already matches its inputs, else None."""
+    try: inputs = render_inputs(t_dir, real_title, template_file)
+    except OSError: return None
+    if not is_current(t_dir, inputs): return None
+    return {"status": "success", "path": f"/done/{dir_name}/resume.pdf",
+            "file": os.path.join(t_dir, "resume.pdf"), "skipped": True}
+
+# --- RENDERER ---
+class PDFRenderer:
+    """Long-lived render state, built on first use and kept for the life of the process:
+    - the Jinja environment caches the compiled template and recompiles only when
+      template.html's mtime moves (auto_reload)
+    - one WeasyPrint FontConfiguration is shared by every document
+    - remote assets (the Google Fonts stylesheet and its font files) are fetched once
+      and served from memory afterwards
+    WeasyPrint is not thread-safe around shared font state, so renders are serialized."""
+    def __init__(self, template_file=TEMPLATE_FILE):
+        self.template_file = template_file
+        self.lock = threading.Lock()
+        self.env = jinja2.Environment(loader=jinja2.FileSystemLoader(searchpath="./"), auto_reload=True)
+        self.weasy = None
+        self.font_config = None
+        self.fetched = {}
+
+    def _load_weasyprint(self):
+        if self.weasy is not None: return True
+        try:
+            import weasyprint
+        except ImportError:
+            return False
+        try:
+            from weasyprint.text.fonts import FontConfiguration
+        except ImportError:
+            from weasyprint.fonts import FontConfiguration  # WeasyPrint < 53
+        self.font_config = FontConfiguration()
+        self.weasy = weasyprint
+        return True
+
+    def url_fetcher(self, url, *args, **kwargs):
+        if not url.startswith(("http://", "https://")):
+            return self.weasy.default_url_fetcher(url, *args, **kwargs)
+        hit = self.fetched.get(url)
+        if hit is None:
+            res = self.weasy.default_url_fetcher(url, *args, **kwargs)
+            if 'file_obj' in res:
+                res['string'] = res.pop('file_obj').read()
+            hit = self.fetched[url] = res
+        return dict(hit)
+
+    def template(self):
+        return self.env.get_template(self.template_file)
+
+    def render_file(self, t_dir, dir_name, real_title, force=False):
+        """resume.json -> resume.pdf for one folder. Touches no database, so it runs
+        unchanged inside pool workers. The PDF is written to a temp file and renamed in.
+        Skipped when the manifest says the PDF is already current, unless force is set."""
+        if not t_dir or not os.path.exists(t_dir):
+            return {"status": "error", "message": "Target directory not found."}
+
+        json_path = os.path.join(t_dir, "resume.json")
+        pdf_path = os.path.join(t_dir, "resume.pdf")
+
+        if not os.path.exists(json_path):
+            return {"status": "error", "message": "resume.json artifact missing. Run AI Strike first."}
+
+        try:
+            with open(json_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            return {"status": "error", "message": f"JSON Corrupt: {str(e)}"}
+
+        if not os.path.exists(self.template_file):
+            return {"status": "error", "message": "template.html missing."}
+
+        inputs = render_inputs(t_dir, real_title, self.template_file)
+        if not force and is_current(t_dir, inputs):
+            return {"status": "success", "path": f"/done/{dir_name}/resume.pdf", "file": pdf_path, "skipped": True}
+        if not self._load_weasyprint():
+            return {"status": "error", "message": "CRITICAL: 'weasyprint' not installed."}
+
+        # We FORCE the real title from the database, ignoring the AI or Fallback.
+        data['job_title'] = real_title.upper() if real_title else "PROFESSIONAL TARGET"
+
+        try:
+            html_string = self.template().render(**data)
+        except Exception as e:
+             return {"status": "error", "message": f"Jinja2 Render Error: {str(e)}"}
+
+        tmp_path = f"{pdf_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        t0 = time.perf_counter()
+        try:
+            with self.lock:
+                self.weasy.HTML(string=html_string, base_url='.', url_fetcher=self.url_fetcher).write_pdf(
+                    tmp_path, font_config=self.font_config)
+            os.replace(tmp_path, pdf_path)  # readers never see a half-written PDF
+            write_manifest(t_dir, inputs)
+            print(f"[*] PDF GENERATED: {pdf_path}")
+            return {"status": "success", "path": f"/done/{dir_name}/resume.pdf", "file": pdf_path,
+                    "ms": (time.perf_counter() - t0) * 1000}
+
+        except Exception as e:
+            if os.path.exists(tmp_path): os.remove(tmp_path)
+            print(f"[!] WeasyPrint Error: {e}")
+            return {"status": "error", "message": f"PDF Generation Failed: {str(e)}",
+                    "ms": (time.perf_counter() - t0) * 1000}
+
+    def render(self, job_id, t_dir, dir_name, real_title, conn=None, force=False):
+        """One job whose metadata is already known. Returns the usual status dict."""
+        res = self.render_file(t_dir, dir_name, real_title, force)
+        if "ms" in res: metrics_engine.record("pdf_render", res["ms"], res["status"] == "success", job_id=job_id)
+        if res.get("status") == "success" and not res.get("skipped"):
+            record_pdf(job_id, t_dir, res["file"], conn)
+        return res
+
+    def generate(self, job_id, force=False):
+        print(f"[*] PDF ENGINE: Engaging for Job ID {job_id}...")
+        t_dir, dir_name, real_title, _ = get_job_data(job_id)
+        return self.render(job_id, t_dir, dir_name, real_title, force=force)
+
+    def generate_many(self, job_ids, force=False):
+        """Batch pass: one metadata query and one connection for the whole list,
+        with the template, fonts and fetched assets warm across every job. Returns {id: result}."""
+        job_ids = list(dict.fromkeys(job_ids))
+        start = time.time()
+        conn = get_db()
+        try:
+            meta = job_meta(conn, job_ids)
+            results = {}
+            for jid in job_ids:
+                row = meta.get(jid)
+                if row is None:
+                    results[jid] = {"status": "error", "message": "Target directory not found."}
+                    continue
+                t_dir, dir_name = job_paths(jid, row['title'], row['company'])
+                results[jid] = self.render(jid, t_dir, dir_name, row['title'], conn, force)
+        finally:
+            conn.close()
+        ok = sum(1 for r in results.values() if r.get("status") == "success")
+        print(f"[*] PDF ENGINE: batch of {len(job_ids)} ({ok} ok) in {time.time() - start:.2f}s")
+        return results
+
+renderer = PDFRenderer()
+
+def generate_pdf(job_id, force=False):
+    return renderer.generate(job_id, force)
+
+def generate_pdfs(job_ids, force=False):
+    return renderer.generate_many(job_ids, force)
+
+# --- PROCESS POOL QUEUE ---
+# WeasyPrint layout is CPU-bound and holds the GIL, so renders run in worker processes.
+# Each worker builds its own PDFRenderer once (initializer) and keeps it warm; the
+# server process only does the metadata lookup and the artifacts bookkeeping.
+_worker_renderer = None
+
+def _init_worker():
+    global _worker_renderer
+    _worker_renderer = PDFRenderer()
+    _worker_renderer._load_weasyprint()
+
+def _render_in_worker(t_dir, dir_name, real_title, force=False):
+    return _worker_renderer.render_file(t_dir, dir_name, real_title, force)
+
+class PDFQueue:
+    """Async PDF jobs on a process pool sized to the cores. submit() returns a batch id
+    immediately; status() reports per-job state for polling."""
+    def __init__(self, workers=PDF_WORKERS):
+        self.workers = workers
+        self.pool = None
+        self.lock = threading.Lock()  # guards the executor; batches have their own
+        self.ledger = batch_engine.BatchLedger(MAX_BATCHES, pending=("QUEUED",))
+
+    def _executor(self):
+        with self.lock:
+            if self.pool is None:
+                self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                                mp_context=multiprocessing.get_context("spawn"))
+            return self.pool
+
+    def submit(self, job_ids, force=False):
+        job_ids = list(dict.fromkeys(job_ids))
+        conn = get_db()
+        try: meta = job_meta(conn, job_ids)
+        finally: conn.close()
+        entries = [{"n": i, "id": jid, "state": "QUEUED", "submitted": time.time(), "finished": None,
+                    "result": None, "done": threading.Event()} for i, jid in enumerate(job_ids)]
+        batch_id = self.ledger.add(entries)
+        for entry in entries:
+            row = meta.get(entry['id'])
+            if row is None:
+                self._finish(entry, {"status": "error", "message": "Target directory not found."})
+                continue
+            t_dir, dir_name = job_paths(entry['id'], row['title'], row['company'])
+            # Unchanged inputs never leave this process: no IPC, no pool start-up
+            current = None if force else up_to_date(t_dir, dir_name, row['title'])
+            if current:
+                self._finish(entry, current)
+                continue
+            try:
+                fut = self._executor().submit(_render_in_worker, t_dir, dir_name, row['title'], force)
+            except BrokenProcessPool as e:
+                self._reset()
+                self._finish(entry, {"status": "error", "message": f"PDF worker pool died: {e}"})
+                continue
+            fut.add_done_callback(lambda f, entry=entry, t_dir=t_dir: self._collect(f, entry, t_dir))
+        print(f"[*] PDF QUEUE: Batch {batch_id} armed with {len(job_ids)} renders.")
+        return batch_id
+
+    def _collect(self, fut, entry, t_dir):
+        try:
+            res = fut.result()
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool): self._reset()
+            res = {"status": "error", "message": f"PDF Generation Failed: {e}"}
+        if "ms" in res:
+            metrics_engine.record("pdf_render", res["ms"], res["status"] == "success", job_id=entry['id'],
+                                  queued_ms=round((time.time() - entry['submitted']) * 1000 - res["ms"], 1))
+        if res.get("status") == "success" and not res.get("skipped"):
+            try: record_pdf(entry['id'], t_dir, res["file"])
+            except Exception as e: print(f"[!] PDF QUEUE: artifact record failed for {entry['id']}: {e}")
+        self._finish(entry, res)
+
+    def _finish(self, entry, res):
+        entry['result'] = res
+        entry['state'] = "SUCCESS" if res.get("status") == "success" else "FAILED"
+        entry['finished'] = time.time()
+        entry['done'].set()
+
+    def _reset(self):
+        with self.lock:
+            pool, self.pool = self.pool, None
+        if pool: pool.shutdown(wait=False, cancel_futures=True)
+
+    def wait(self, batch_id, timeout=PDF_WAIT_SECS):
+        """Blocks until every job in the batch finishes (or timeout). Returns {id: result}."""
+        batch = self.ledger.get(batch_id)
+        if not batch: return {}
+        deadline = time.time() + timeout
+        for e in batch['entries']: e['done'].wait(max(0, deadline - time.time()))
+        return {e['id']: e['result'] or {"status": "error", "message": "PDF render timed out."} for e in batch['entries']}
+
+    def run(self, job_id, timeout=PDF_WAIT_SECS, force=False):
+        return self.wait(self.submit([job_id], force), timeout)[job_id]
+
+    @staticmethod
+    def _describe(e):
+        res = e['result'] or {}
+        return {"n": e['n'], "id": e['id'], "state": e['state'],
+                "elapsed": round((e['finished'] or time.time()) - e['submitted'], 2),
+                "path": res.get('path'), "skipped": bool(res.get('skipped')), "error": res.get('message') if e['state'] == "FAILED" else None}
+
+    def status(self, batch_id):
+        return self.ledger.status(batch_id, self._describe)
+
+    def shutdown(self):
+        self._reset()
+
+queue = PDFQueue()
+atexit.register(queue.shutdown)
 
 if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        print(generate_pdf(sys.argv[1]))
+    force = "--force" in sys.argv
+    ids = [a for a in sys.argv[1:] if a != "--force"]
+    if len(ids) > 1:
+        print(json.dumps(generate_pdfs(ids, force), indent=2))
+    elif ids:
+        print(generate_pdf(ids[0], force))
     else:
-        print("Usage: python pdf_engine.py <job_id>")
+        print("Usage: python pdf_engine.py [--force] <job_id> [job_id ...]")
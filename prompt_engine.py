@@ -0,0 +1,285 @@
+import os
+import re
+import json
+import threading
+import config_store
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# --- CONFIG ---
+OUTPUT_RESERVE = int(os.getenv("STRIKE_EST_OUTPUT_TOKENS", "1500"))
+DEFAULT_TOKEN_LIMIT = int(os.getenv("PROMPT_TOKEN_LIMIT", "8000"))
+TOKENIZER = os.getenv("PROMPT_TOKENIZER", "cl100k_base")
+MIN_DESC_TOKENS = int(os.getenv("PROMPT_MIN_DESC_TOKENS", "400"))
+
+# Per-request ceiling (prompt + completion): the smaller of the model's context window and the
+# free-tier tokens-per-minute quota, since Groq rejects a single request above TPM with a 413.
+# Override or extend with PROMPT_TOKEN_LIMITS='{"model": tokens}'.
+MODEL_TOKEN_LIMITS = {
+    "moonshotai/kimi-k2-instruct": 10000,
+    "moonshotai/kimi-k2-instruct-0905": 10000,
+    "llama-3.3-70b-versatile": 12000,
+    "llama-3.1-8b-instant": 6000,
+    "qwen/qwen3-32b": 6000,
+    "openai/gpt-oss-20b": 8000,
+    "openai/gpt-oss-safeguard-20b": 8000,
+    "allam-2-7b": 4096,
+    "meta-llama/llama-4-scout-17b-16e-instruct": 30000,
+    "meta-llama/llama-4-maverick-17b-128e-instruct": 6000,
+    "groq/compound": 70000,
+    "groq/compound-mini": 70000,
+}
+MODEL_TOKEN_LIMITS.update(json.loads(os.getenv("PROMPT_TOKEN_LIMITS", "{}")))
+
+PARKER_TEMPLATE = """
+SYSTEM IDENTITY:
+You are Parker Lewis. The deadliest resume writer alive.
+- You operate from a Penthouse office, charging $250/hour.
+- You do not miss. You have a 98.7% conversion rate.
+- You co-invented modern ATS parsing standards.
+
+MISSION:
+Take the CLIENT MASTER RESUME and the TARGET JOB DESCRIPTION.
+Forge a precision tactical asset (Resume) in JSON format.
+
+CONSTRAINTS:
+1.  **Format:** Output MUST be valid JSON matching the schema below.
+2.  **Tone:** Arrogant, efficient, precise. No fluff. High-impact verbs only.
+3.  **Strategy:** Position the client as an "Apex Predator of Logistics Efficiency."
+4.  **Tactics:** Use the provided "STRATEGIC ASSETS" (Tags) to hallucinate a bridge.
+
+INPUT DATA:
+[CLIENT MASTER RESUME]
+{resume_text}
+
+[STRATEGIC ASSETS (TAGS)]
+Qualifications: {quals}
+Skills: {skills}
+
+[TARGET JOB DESCRIPTION]
+{job_desc}
+
+[REQUIRED JSON SCHEMA]
+{{
+  "contact": {{ "name": "...", "info": "...", "links": "..." }},
+  "summary": "...",
+  "skills_sidebar": ["..."],
+  "skills_main": ["..."],
+  "experience": [
+    {{ "company": "...", "location": "...", "role": "...", "dates": "...", "bullets": ["..."] }}
+  ],
+  "education": ["..."],
+  "certs": ["..."]
+}}
+
+EXECUTE.
+"""
+
+# --- TOKENS ---
+# tiktoken's cl100k is not the tokenizer of every Groq model, but it tracks them far better
+# than character counts; without it we fall back to ~4 characters per token.
+_encoder = None
+
+def encoder():
+    global _encoder
+    if _encoder is None and tiktoken is not None:
+        try: _encoder = tiktoken.get_encoding(TOKENIZER)
+        except Exception as e:
+            print(f"[!] PROMPT ENGINE: tokenizer unavailable ({e}); using length heuristic")
+            _encoder = False
+    return _encoder or None
+
+def count_tokens(text):
+    if not text: return 0
+    enc = encoder()
+    return len(enc.encode(text, disallowed_special=())) if enc else (len(text) + 3) // 4
+
+def truncate_tokens(text, limit):
+    """First `limit` tokens of text, cut back to a word boundary."""
+    enc = encoder()
+    if enc:
+        ids = enc.encode(text, disallowed_special=())
+        if len(ids) <= limit: return text
+        cut = enc.decode(ids[:limit])
+    else:
+        if len(text) <= limit * 4: return text
+        cut = text[:limit * 4]
+    return cut[:cut.rfind(" ")] if " " in cut[-40:] else cut
+
+def token_limit(model):
+    return MODEL_TOKEN_LIMITS.get(model, DEFAULT_TOKEN_LIMIT)
+
+# --- COMPILED TEMPLATE ---
+_FIELDS = re.compile(r"\{(resume_text|quals|skills|job_desc)\}")
+
+class CompiledPrompt:
+    """The template with everything but the job folded in, for one resume/tags version.
+    full_head + job_desc + tail is byte-identical to the old per-strike f-string."""
+    def __init__(self, template, resume_text, tags_db):
+        # Split on the placeholders, then unescape {{ }} in the literal runs exactly as format() would
+        parts = _FIELDS.split(template)
+        lits = [p.replace("{{", "{").replace("}}", "}") for p in parts[0::2]]
+        fields = parts[1::2]
+        assert fields == ["resume_text", "quals", "skills", "job_desc"], fields
+        self.pre, self.between_quals, self.between_skills, self.before_desc, self.tail = lits
+        self.resume_text = resume_text
+        self.quals = list(tags_db.get('qualifications', []))
+        self.skills = list(tags_db.get('skills', []))
+        self.pre += resume_text
+        self.full_head = self.head(self.quals, self.skills)
+        self.static_tokens = count_tokens(self.pre + self.between_quals + self.between_skills + self.before_desc + self.tail)
+        self.tag_tokens = {t: count_tokens(t) + 1 for t in self.quals + self.skills}  # + the ", " separator
+        self.full_tokens = self.static_tokens + sum(self.tag_tokens.get(t, 0) for t in self.quals + self.skills)
+
+    def head(self, quals, skills):
+        return self.pre + self.between_quals + ", ".join(quals) + self.between_skills + ", ".join(skills) + self.before_desc
+
+    def split(self, quals, skills):
+        """Shared-prefix layout: everything job-independent (identity, resume, tags, schema) as the
+        system message, then the job description and the closing order as the user message."""
+        schema, _, closing = self.tail.rpartition("\n\n")
+        system = self.pre + self.between_quals + ", ".join(quals) + self.between_skills + ", ".join(skills) + schema
+        return system, self.before_desc.lstrip("\n")
+
+    def closing(self):
+        return self.tail.rpartition("\n\n")[2]
+
+class CompiledOverride:
+    """A user prompt with {resume_text} folded in; {job_desc} is filled per strike."""
+    def __init__(self, override, resume_text):
+        self.text = override.replace("{resume_text}", resume_text)
+        self.static_tokens = count_tokens(self.text.replace("{job_desc}", ""))
+        # Shared-prefix layout: whatever precedes the first {job_desc} is the stable part
+        prefix, found, rest = self.text.partition("{job_desc}")
+        self.prefix, self.rest = (prefix, rest) if found else (None, None)
+
+_compiled = {}
+_lock = threading.Lock()
+
+def compiled(prompt_override=None):
+    """Cached per template and per config version; a stat() per call keeps hand edits live."""
+    resume_text = config_store.RESUME.get()
+    tags_db = config_store.TAGS.get()
+    key = (prompt_override, config_store.RESUME.version, config_store.TAGS.version)
+    hit = _compiled.get(key)
+    if hit is None:
+        with _lock:
+            hit = _compiled.get(key)
+            if hit is None:
+                if len(_compiled) > 32: _compiled.clear()
+                hit = _compiled[key] = (CompiledOverride(prompt_override, resume_text) if prompt_override
+                                        else CompiledPrompt(PARKER_TEMPLATE, resume_text, tags_db))
+    return hit
+
+# --- BUILD ---
+def rank_tags(tags, desc_lower):
+    """Tags the job description actually mentions first, the rest after, each in original order."""
+    hits = [t for t in tags if t.lower() in desc_lower]
+    return hits, [t for t in tags if t.lower() not in desc_lower]
+
+def build(job_desc, model, prompt_override=None, base=None, layout="single"):
+    """Prompt for one job, trimmed to the model's budget. Unrelated tags go first, then
+    mentioned tags and the description tail (never below MIN_DESC_TOKENS).
+    Returns {prompt, messages, tokens, budget, tags_dropped, desc_trimmed}.
+    layout="prefix" emits [system, user] with a system message that is identical for every job
+    in a batch, so the provider's prompt cache can reuse it; there the tag list is trimmed in
+    stored order rather than per job, to keep the prefix stable."""
+    base = base or compiled(prompt_override)
+    if layout == "prefix": return build_prefix(job_desc, model, base)
+    info = _build_single(job_desc, model, base)
+    info['messages'] = [{"role": "user", "content": info['prompt']}]
+    return info
+
+def _build_single(job_desc, model, base):
+    budget = token_limit(model) - OUTPUT_RESERVE
+    desc_tokens = count_tokens(job_desc)
+    info = {"budget": budget, "tags_dropped": 0, "desc_trimmed": False}
+
+    if isinstance(base, CompiledOverride):
+        if "{job_desc}" in base.text and base.static_tokens + desc_tokens > budget:
+            allow = max(MIN_DESC_TOKENS, budget - base.static_tokens)
+            job_desc, info['desc_trimmed'] = truncate_tokens(job_desc, allow), True
+            desc_tokens = min(desc_tokens, allow)
+        prompt = base.text.replace("{job_desc}", job_desc)
+        info.update(prompt=prompt, tokens=base.static_tokens + desc_tokens if "{job_desc}" in base.text else base.static_tokens)
+        return info
+
+    if base.full_tokens + desc_tokens <= budget:
+        info.update(prompt=base.full_head + job_desc + base.tail, tokens=base.full_tokens + desc_tokens)
+        return info
+
+    desc_lower = job_desc.lower()
+    cost = base.tag_tokens
+    ranked = {}
+    for cat, tags in (("quals", base.quals), ("skills", base.skills)):
+        ranked[cat] = rank_tags(tags, desc_lower)
+    relevant = [(c, t) for c in ranked for t in ranked[c][0]]
+    others = [(c, t) for c in ranked for t in ranked[c][1]]
+    relevant_cost = sum(cost[t] for _, t in relevant)
+
+    room = budget - base.static_tokens
+    if desc_tokens + relevant_cost > room:
+        allow = max(MIN_DESC_TOKENS, room - relevant_cost)
+        if desc_tokens > allow:
+            job_desc, desc_tokens, info['desc_trimmed'] = truncate_tokens(job_desc, allow), allow, True
+    room -= desc_tokens
+
+    keep = {"quals": set(), "skills": set()}
+    for cat, t in relevant + others:
+        if cost[t] > room: continue
+        keep[cat].add(t)
+        room -= cost[t]
+    quals = [t for t in base.quals if t in keep["quals"]]
+    skills = [t for t in base.skills if t in keep["skills"]]
+    info['tags_dropped'] = len(base.quals) + len(base.skills) - len(quals) - len(skills)
+    info.update(prompt=base.head(quals, skills) + job_desc + base.tail, tokens=budget - room)
+    return info
+
+def build_prefix(job_desc, model, base):
+    budget = token_limit(model) - OUTPUT_RESERVE
+    desc_tokens = count_tokens(job_desc)
+    info = {"budget": budget, "tags_dropped": 0, "desc_trimmed": False}
+
+    if isinstance(base, CompiledOverride):
+        if base.prefix is None:  # no {job_desc} slot: nothing varies, send it as is
+            info.update(_build_single(job_desc, model, base))
+            info['messages'] = [{"role": "user", "content": info['prompt']}]
+            return info
+        system, tail, static = base.prefix, base.rest.replace("{job_desc}", job_desc), base.static_tokens
+        if static + desc_tokens > budget:
+            allow = max(MIN_DESC_TOKENS, budget - static)
+            job_desc, desc_tokens, info['desc_trimmed'] = truncate_tokens(job_desc, allow), min(desc_tokens, allow), True
+            tail = base.rest.replace("{job_desc}", job_desc)
+        user = job_desc + tail
+        tokens = static + desc_tokens
+    else:
+        # Tags stay in stored order and are only cut when the prefix itself would crowd out
+        # MIN_DESC_TOKENS of description; the same cut then applies to every job in the batch
+        quals, skills = base.quals, base.skills
+        room = budget - base.static_tokens - MIN_DESC_TOKENS
+        if base.full_tokens - base.static_tokens > room:
+            kept = []
+            for t in base.quals + base.skills:
+                if base.tag_tokens[t] > room: break
+                kept.append(t)
+                room -= base.tag_tokens[t]
+            kept = set(kept)
+            quals = [t for t in base.quals if t in kept]
+            skills = [t for t in base.skills if t in kept]
+            info['tags_dropped'] = len(base.quals) + len(base.skills) - len(kept)
+        prefix_tokens = base.static_tokens + sum(base.tag_tokens[t] for t in quals + skills)
+        if prefix_tokens + desc_tokens > budget:
+            allow = max(MIN_DESC_TOKENS, budget - prefix_tokens)
+            if desc_tokens > allow:
+                job_desc, desc_tokens, info['desc_trimmed'] = truncate_tokens(job_desc, allow), allow, True
+        system, desc_header = base.split(quals, skills)
+        user = desc_header + job_desc + "\n\n" + base.closing()
+        tokens = prefix_tokens + desc_tokens
+
+    info['messages'] = [{"role": "system", "content": system}, {"role": "user", "content": user}]
+    # Flat form for the transmission log and the strike cache key
+    info.update(prompt=f"[SYSTEM]\n{system}\n[USER]\n{user}", tokens=tokens)
+    return info
@@ -0,0 +1,126 @@
+import os
+import time
+import random
+import threading
+from urllib.parse import urlsplit
+import httpx
+
+# --- CONFIG ---
+# PROXY_URLS is a comma list; the old single PROXY_URL still works on its own
+PROXY_URLS = [u.strip() for u in (os.getenv("PROXY_URLS") or os.getenv("PROXY_URL", "")).split(",") if u.strip()]
+PROXY_BYPASS_CHANCE = float(os.getenv("PROXY_BYPASS_CHANCE", "0.15"))
+PROBE_URL = os.getenv("PROXY_PROBE_URL", "https://api.groq.com/openai/v1/models")
+PROBE_EVERY = float(os.getenv("PROXY_PROBE_SECS", "30"))
+PROBE_TIMEOUT = float(os.getenv("PROXY_PROBE_TIMEOUT", "5"))
+EWMA_ALPHA = float(os.getenv("PROXY_EWMA_ALPHA", "0.3"))
+MAX_FAILS = int(os.getenv("PROXY_MAX_FAILS", "3"))        # consecutive failures before a route is benched
+DOWN_SECS = float(os.getenv("PROXY_DOWN_SECS", "30"))
+DOWN_MAX_SECS = float(os.getenv("PROXY_DOWN_MAX_SECS", "600"))
+DIRECT = "DIRECT"
+
+def route_label(url):
+    """Proxy URL without credentials, used as the route name in logs and metrics."""
+    parts = urlsplit(url)
+    return f"PROXY_{parts.hostname}:{parts.port}" if parts.port else f"PROXY_{parts.hostname}"
+
+def http_probe(url, timeout=PROBE_TIMEOUT):
+    """Any HTTP answer through the proxy counts as alive (the probe URL may well say 401)."""
+    start = time.perf_counter()
+    with httpx.Client(proxy=url, timeout=timeout) as client:
+        client.get(PROBE_URL)
+    return (time.perf_counter() - start) * 1000
+
+class ProxyPool:
+    """Health-scored proxy routes. Latency is an EWMA of probe round-trips; errors are an EWMA
+    fed by both probes and real strikes. pick() takes the fastest healthy proxy, goes DIRECT
+    for the configured bypass share, and falls back to DIRECT when no proxy is healthy."""
+    def __init__(self, urls=PROXY_URLS, probe=http_probe, probe_every=PROBE_EVERY):
+        self.routes = {u: {"url": u, "label": route_label(u), "latency_ms": None, "error_rate": 0.0,
+                           "fails": 0, "down_until": 0.0, "last_probe": None, "last_error": None} for u in urls}
+        self.probe = probe
+        self.probe_every = probe_every
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def start(self):
+        """Starts the probe loop on first use rather than at import: spawn workers (PDF, parse
+        pools) re-import the server module and must not each probe every proxy."""
+        if self.thread is not None or not self.routes or self.probe_every <= 0: return
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._loop, name="proxy-probe", daemon=True)
+                self.thread.start()
+
+    # --- SCORING ---
+    def _update(self, r, ok, ms=None, error=None, now=None):
+        now = now or time.time()
+        r['error_rate'] = EWMA_ALPHA * (0.0 if ok else 1.0) + (1 - EWMA_ALPHA) * r['error_rate']
+        if ok:
+            if ms is not None:
+                r['latency_ms'] = ms if r['latency_ms'] is None else EWMA_ALPHA * ms + (1 - EWMA_ALPHA) * r['latency_ms']
+            r['fails'] = 0
+            r['down_until'] = 0.0
+            return
+        r['fails'] += 1
+        r['last_error'] = str(error)[:200] if error else "failed"
+        if r['fails'] >= MAX_FAILS:
+            r['down_until'] = now + min(DOWN_MAX_SECS, DOWN_SECS * 2 ** (r['fails'] - MAX_FAILS))
+            print(f"[!] PROXY POOL: {r['label']} benched for {r['down_until'] - now:.0f}s ({r['last_error']})")
+
+    def report(self, url, ok, ms=None, error=None):
+        """Outcome of real traffic through `url` (None/DIRECT is ignored)."""
+        if not url or url == DIRECT: return
+        with self.lock:
+            r = self.routes.get(url)
+            if r: self._update(r, ok, ms, error)
+
+    @staticmethod
+    def _cost(r):
+        # Unmeasured routes sit between measured ones and nothing; errors inflate the cost
+        latency = r['latency_ms'] if r['latency_ms'] is not None else PROBE_TIMEOUT * 500
+        return latency * (1 + 4 * r['error_rate'])
+
+    def healthy(self, now=None):
+        now = now or time.time()
+        return [r for r in self.routes.values() if r['down_until'] <= now]
+
+    def pick(self):
+        """(proxy url or None, route label)."""
+        if not self.routes: return None, DIRECT
+        self.start()
+        if random.random() < PROXY_BYPASS_CHANCE: return None, DIRECT
+        with self.lock:
+            live = self.healthy()
+            if not live: return None, DIRECT
+            best = min(live, key=self._cost)
+            return best['url'], best['label']
+
+    # --- PROBES ---
+    def probe_all(self):
+        for url in list(self.routes):
+            try:
+                ms, ok, err = self.probe(url), True, None
+            except Exception as e:
+                ms, ok, err = None, False, e
+            with self.lock:
+                r = self.routes[url]
+                r['last_probe'] = time.time()
+                self._update(r, ok, ms, err)
+
+    def _loop(self):
+        while True:
+            try: self.probe_all()
+            except Exception as e: print(f"[!] PROXY POOL: probe sweep failed: {e}")
+            time.sleep(self.probe_every)
+
+    def snapshot(self):
+        self.start()
+        now = time.time()
+        with self.lock:
+            return [{"route": r['label'], "healthy": r['down_until'] <= now,
+                     "latency_ms": round(r['latency_ms'], 1) if r['latency_ms'] is not None else None,
+                     "error_rate": round(r['error_rate'], 3), "fails": r['fails'],
+                     "down_for": round(max(0.0, r['down_until'] - now), 1), "last_error": r['last_error']}
+                    for r in self.routes.values()]
+
+pool = ProxyPool()
@@ -0,0 +1,178 @@
+import os
+import json
+import math
+import time
+import hashlib
+import threading
+import config_store
+import db_engine
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# --- CONFIG ---
+DB_FILE = db_engine.DB_FILE
+PAY_TARGET = float(os.getenv("SCORE_PAY_TARGET", "60000"))        # annual pay that earns full pay credit
+FRESH_HALF_LIFE = float(os.getenv("SCORE_FRESH_HALF_LIFE", "7"))  # days
+RESCORE_DEBOUNCE = float(os.getenv("SCORE_DEBOUNCE_SECS", "5"))
+WEIGHTS = {"tags": 0.35, "resume": 0.35, "pay": 0.15, "fresh": 0.15}
+TAG_WEIGHTS = {"qualifications": 1.0, "skills": 1.0, "benefits": 0.3, "ignored": 0.0}
+BM25_K1, BM25_B = 1.2, 0.75
+
+# Punctuation becomes whitespace and str.split() does the rest; far cheaper than a regex per description
+SPLIT_TABLE = str.maketrans({c: " " for c in "!\"$%&'()*,-./:;<=>?@[\\]^_`{|}~\t\n\r"})
+STOPWORDS = set("""and the for with you your our are will from that this have has not all any can may
+must who what when where which job jobs work working team other per able well also into more
+including such their they them than then there these those been being was were its""".split())
+
+def tokens(text):
+    return [t for t in text.lower().translate(SPLIT_TABLE).split() if len(t) > 2 and t not in STOPWORDS]
+
+# --- INPUTS ---
+def current_inputs():
+    """Everything a score depends on besides the job itself, plus its fingerprint."""
+    resume = config_store.RESUME.get()
+    tags = config_store.TAGS.get()
+    blob = json.dumps([resume, tags], sort_keys=True)
+    return resume, tags, hashlib.sha1(blob.encode()).hexdigest()
+
+def build_query(resume, tags):
+    """Query vector over a small vocabulary: resume terms (log tf) plus sorted tag terms."""
+    weights = {}
+    counts = {}
+    for t in tokens(resume): counts[t] = counts.get(t, 0) + 1
+    for t, c in counts.items(): weights[t] = 1.0 + math.log(c)
+    for cat in ("qualifications", "skills"):
+        for tag in tags.get(cat, []):
+            for t in tokens(tag): weights[t] = weights.get(t, 0.0) + 1.0
+    vocab = {t: i for i, t in enumerate(weights, 1)}  # ids start at 1 so map(vocab.get) can filter misses
+    qvec = np.array([0.0] + [weights[t] for t in vocab], dtype=np.float64)
+    return vocab, qvec
+
+# --- SCORING ---
+def score_rows(rows, vocab, qvec, category_map, model=None):
+    """rows: (id, title, description, attrs, annual_pay, date_posted).
+    model holds the corpus statistics (idf, avgdl, similarity scale); a full pass fits it,
+    incremental passes reuse it so new scores stay comparable with old ones.
+    Returns (ids, 0-100 scores, model), all computed with whole-batch array math."""
+    n = len(rows)
+    doc_idx, term_idx = [], []
+    doc_len = np.zeros(n)
+    tag_score = np.zeros(n)
+    for i, (_, title, desc, attrs, _, _) in enumerate(rows):
+        toks = f"{title or ''} {desc or ''}".lower().translate(SPLIT_TABLE).split()
+        doc_len[i] = len(toks)
+        hits = list(filter(None, map(vocab.get, toks)))
+        doc_idx.extend([i] * len(hits))
+        term_idx.extend(hits)
+        if attrs:
+            vals = attrs.split("\x1f")
+            got = sum(TAG_WEIGHTS.get(category_map.get(v), 0.0) for v in vals)
+            tag_score[i] = min(1.0, got / max(3.0, len(vals) * 0.5))
+
+    # BM25 on COO triplets: unique (doc, term) keys -> term frequencies, then one bincount per doc
+    V = len(vocab) + 1
+    fit = model is None
+    d = t = tf = np.zeros(0, dtype=np.int64)
+    if term_idx:
+        keys, tf = np.unique(np.asarray(doc_idx, dtype=np.int64) * V + np.asarray(term_idx, dtype=np.int64), return_counts=True)
+        d, t = keys // V, keys % V
+    if fit:
+        df = np.bincount(t, minlength=V)
+        model = {"idf": np.log(1.0 + (n - df + 0.5) / (df + 0.5)).tolist(),
+                 "avgdl": max(float(doc_len.mean()), 1.0), "scale": 1.0}
+    idf = np.asarray(model["idf"])
+    norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * doc_len[d] / model["avgdl"])
+    sim = np.bincount(d, weights=qvec[t] * idf[t] * tf * (BM25_K1 + 1) / norm, minlength=n)
+    if fit:
+        pos = sim[sim > 0]
+        if pos.size: model["scale"] = float(np.median(pos))
+    resume_score = 1.0 - np.exp(-sim / max(model["scale"], 1e-9))
+
+    pay = np.array([r[4] or 0 for r in rows], dtype=np.float64)
+    pay_score = np.where(pay > 0, np.clip(pay / PAY_TARGET, 0, 1.0), 0.3)
+    age = np.array([r[5] if r[5] is not None else 999 for r in rows], dtype=np.float64)
+    fresh_score = np.where(age >= 999, 0.0, np.exp(-np.clip(age, 0, None) * math.log(2) / FRESH_HALF_LIFE))
+
+    total = (WEIGHTS["tags"] * tag_score + WEIGHTS["resume"] * resume_score
+             + WEIGHTS["pay"] * pay_score + WEIGHTS["fresh"] * fresh_score)
+    scores = np.rint(total * 100).astype(int)
+    return [r[0] for r in rows], scores.tolist(), model
+
+def _meta(conn, key):
+    row = conn.execute("SELECT value FROM meta_text WHERE key=?", (key,)).fetchone()
+    return row[0] if row else None
+
+def _set_meta(conn, key, value):
+    conn.execute("INSERT INTO meta_text (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value=excluded.value", (key, value))
+
+def rescore(conn=None, full=False):
+    """Incremental by default: only unscored rows, unless the resume/tags fingerprint moved
+    since the last pass, in which case every row is rescored. Returns the rescored count."""
+    if np is None:
+        print("[!] SCORE ENGINE: numpy not installed; scores left as-is.")
+        return 0
+    own = conn is None
+    if own: conn = db_engine.connect(DB_FILE)
+    try:
+        start = time.time()
+        resume, tags, sig = current_inputs()
+        full = full or _meta(conn, 'score_inputs') != sig
+        vocab, qvec = build_query(resume, tags)
+        category_map = config_store.TAGS.view('category_map')
+        where = "" if full else " WHERE scored = 0"
+        cur = conn.execute(f"""SELECT id, title, COALESCE(json_extract(raw_json, '$.description.text'), ''),
+                                      (SELECT group_concat(lower(value), char(31)) FROM json_each(raw_json, '$.attributes')),
+                                      annual_pay, date_posted
+                               FROM jobs{where}""")
+        rows = cur.fetchall()
+        if not rows: return 0
+        model = None if full else json.loads(_meta(conn, 'score_model') or 'null')
+        ids, scores, model = score_rows(rows, vocab, qvec, category_map, model)
+        with conn:
+            # Unchanged scores are skipped so the listing index and jobs_version stay put
+            conn.executemany("UPDATE jobs SET score=?1, scored=1 WHERE id=?2 AND (score IS NOT ?1 OR scored=0)", list(zip(scores, ids)))
+            _set_meta(conn, 'score_inputs', sig)
+            _set_meta(conn, 'score_model', json.dumps(model))
+        print(f"[*] SCORE ENGINE: {'full' if full else 'incremental'} pass over {len(ids)} jobs in {time.time() - start:.2f}s")
+        return len(ids)
+    finally:
+        if own: conn.close()
+
+# --- BACKGROUND TRIGGER ---
+_pending = threading.Event()
+_worker = None
+_worker_lock = threading.Lock()
+_seen_versions = None
+
+def _loop():
+    while True:
+        _pending.wait()
+        # Debounce: tag harvesting fires in bursts, rescore once things go quiet
+        while _pending.is_set():
+            _pending.clear()
+            time.sleep(RESCORE_DEBOUNCE)
+        try: rescore()
+        except Exception as e: print(f"[!] SCORE ENGINE FAILURE: {e}")
+
+def schedule_rescore():
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = threading.Thread(target=_loop, name="rescore", daemon=True)
+            _worker.start()
+    _pending.set()
+
+def watch_inputs():
+    """Cheap enough for every listing read (one stat() per file). The resume is hand-edited,
+    so nothing else notices a change; a moved RESUME/TAGS version schedules a rescore,
+    which goes full only if the fingerprint really changed."""
+    global _seen_versions
+    config_store.RESUME.refresh()
+    config_store.TAGS.refresh()
+    seen = (config_store.RESUME.version, config_store.TAGS.version)
+    if seen == _seen_versions: return
+    _seen_versions = seen
+    schedule_rescore()
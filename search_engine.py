@@ -0,0 +1,52 @@
+import re
+
+# --- CONFIG ---
+# bm25 column weights: id (unindexed), title, company, city, description, tags
+BM25_WEIGHTS = (0.0, 6.0, 3.0, 1.0, 1.0, 2.5)
+MAX_LIMIT = 500
+
+FRESH_RE = re.compile(r"\bwithin\s+(\d+)\s*days?\b(?:\s+fresh)?|\b(\d+)\s+days?\s+fresh\b|\bfresh:(\d+)\b", re.I)
+WORD_RE = re.compile(r"[\w'-]+", re.UNICODE)
+FILLER = {"fresh", "within", "and", "the", "a", "an", "of", "in", "for", "with"}
+
+def build_match(q):
+    """Plain words -> AND of quoted FTS5 terms. A 'within N days' / 'N days fresh' / 'fresh:N'
+    phrase becomes a date_posted filter instead of a text term. Returns (match, max_age)."""
+    max_age = None
+    m = FRESH_RE.search(q)
+    if m:
+        max_age = int(next(g for g in m.groups() if g))
+        q = q[:m.start()] + " " + q[m.end():]
+    terms = [w for w in WORD_RE.findall(q) if w.lower() not in FILLER]
+    return " ".join('"' + t.replace('"', '""') + '"' for t in terms), max_age
+
+def search(conn, q, limit=50, status=None, raw=False):
+    """Ranked hits with a highlighted description snippet. raw=True passes q straight to FTS5."""
+    match, max_age = (q, None) if raw else build_match(q)
+    if not match and max_age is None: return []
+    cols = """j.id, j.title, j.company, j.city, j.pay_fmt, j.date_posted, j.score, j.status, j.url,
+              a.dir, COALESCE(a.has_ai, 0) AS has_ai, COALESCE(a.has_pdf, 0) AS has_pdf"""
+    params = []
+    if match:
+        weights = ", ".join(str(w) for w in BM25_WEIGHTS)
+        sql = f"""SELECT {cols}, snippet(jobs_fts, 4, '<mark>', '</mark>', '…', 16) AS snippet,
+                         bm25(jobs_fts, {weights}) AS rank
+                  FROM jobs_fts JOIN jobs j ON j.id = jobs_fts.id
+                  LEFT JOIN artifacts a ON a.job_id = j.id
+                  WHERE jobs_fts MATCH ?"""
+        params.append(match)
+    else:
+        # Freshness-only query: no text to rank by, so newest first
+        sql = f"""SELECT {cols}, '' AS snippet, j.date_posted AS rank
+                  FROM jobs j LEFT JOIN artifacts a ON a.job_id = j.id WHERE 1=1"""
+    if max_age is not None:
+        sql += " AND j.date_posted <= ?"
+        params.append(max_age)
+    if status == 'DENIED':
+        sql += " AND j.status IN ('DENIED', 'AUTO_DENIED')"
+    elif status:
+        sql += " AND j.status = ?"
+        params.append(status)
+    sql += " ORDER BY rank LIMIT ?"
+    params.append(min(max(int(limit), 1), MAX_LIMIT))
+    return conn.execute(sql, params).fetchall()
@@ -1,4 +1,4 @@
-from flask import Flask, jsonify, request, send_from_directory
+from flask import Flask, Response, jsonify, request, send_from_directory, stream_with_context
 import sqlite3
 import json
 import os
@@ -6,11 +6,31 @@ import random
 import glob
 import traceback
 import subprocess
-from datetime import datetime
-from groq import Groq
+import base64
+import hashlib
+import threading
+import time
+import re
+import asyncio
 import httpx
+from collections import deque
+from datetime import datetime
 from dotenv import load_dotenv
+import config_store
+import db_engine
+import artifact_engine
+import metrics_engine
+import batch_engine
+import client_pool
+import proxy_pool
+import strike_cache
+import blacklist_engine
+import search_engine
+import score_engine
+import prompt_engine
+import triage_engine
 
+# Only these pull in optional dependencies (jinja2/weasyprint, dateutil); the server runs without them
 try:
     import migration_engine
     import pdf_engine
@@ -22,19 +42,29 @@ load_dotenv()
 app = Flask(__name__, static_folder='static', template_folder='templates')
 
 # --- CONFIGURATION ---
-DB_FILE = 'jobs.db'
-HISTORY_FILE = 'job_history.json'
-TAGS_FILE = 'categorized_tags.json'
-BLACKLIST_FILE = 'blacklist.json'
-RESUME_FILE = 'master_resume.txt'
-PROMPTS_FILE = 'user_prompts.json'
-PROXY_URL = os.getenv("PROXY_URL", "")
-PROXY_BYPASS_CHANCE = float(os.getenv("PROXY_BYPASS_CHANCE", "0.15"))
+DB_FILE = db_engine.DB_FILE
+HISTORY_FILE = config_store.HISTORY_FILE
+TAGS_FILE = config_store.TAGS_FILE
+BLACKLIST_FILE = config_store.BLACKLIST_FILE
+RESUME_FILE = config_store.RESUME_FILE
+PROMPTS_FILE = config_store.PROMPTS_FILE
 EDITOR_CMD = os.getenv("EDITOR_CMD", "xdg-open")
+KEY_RPM = int(os.getenv("GROQ_KEY_RPM", "30"))
+KEY_TPM = int(os.getenv("GROQ_KEY_TPM", "12000"))
+EST_OUTPUT_TOKENS = int(os.getenv("STRIKE_EST_OUTPUT_TOKENS", "1500"))
+STRIKE_WORKERS = int(os.getenv("STRIKE_WORKERS", "4"))
+BATCH_PROMPT_LAYOUT = os.getenv("BATCH_PROMPT_LAYOUT", "prefix")  # "prefix" (shared system message) or "single"
+STRIKE_RETRIES = int(os.getenv("STRIKE_RETRIES", "3"))
+RETRY_BASE_SECS = float(os.getenv("STRIKE_RETRY_BASE_SECS", "0.5"))
+RETRY_MAX_SECS = float(os.getenv("STRIKE_RETRY_MAX_SECS", "8"))
+KEY_COOLDOWN_BASE = float(os.getenv("GROQ_KEY_COOLDOWN_SECS", "5"))
+KEY_COOLDOWN_MAX = float(os.getenv("GROQ_KEY_COOLDOWN_MAX_SECS", "300"))
+KEY_INVALID_SECS = float(os.getenv("GROQ_KEY_INVALID_SECS", "3600"))
 SESSION_STATS = {"scraped":0, "approved":0, "denied":0, "sent_to_groq":0}
 
 # --- KEY DECK ---
 class KeyDeck:
+    """Hands out keys by remaining requests/tokens-per-minute budget, not blind rotation."""
     def __init__(self):
         raw = os.getenv("GROQ_KEYS", "")
         self.deck = []
@@ -42,59 +72,174 @@ class KeyDeck:
             item = item.strip()
             if ":" in item:
                 name, key = item.split(":", 1)
-                self.deck.append({"name": name.strip(), "key": key.strip()})
+                self.deck.append(self._card(name.strip(), key.strip()))
             elif item:
-                self.deck.append({"name": "Unknown", "key": item})
+                self.deck.append(self._card("Unknown", item))
+        self.lock = threading.Lock()
         self.shuffle()
         self.cursor = 0
         if self.deck: print(f"[*] DECK LOADED: {len(self.deck)} Keys ready.")
         else: print("[!] WARNING: NO GROQ KEYS LOADED.")
 
+    @staticmethod
+    def _card(name, key):
+        # cool_until: quarantined until then; strikes: consecutive 429s, drives the back-off
+        return {"name": name, "key": key, "window": deque(), "cool_until": 0.0, "strikes": 0,
+                "state": "OK", "last_error": None}
+
     def shuffle(self):
         random.shuffle(self.deck)
         self.cursor = 0
 
-    def draw(self):
-        if not self.deck: return None, None
-        if self.cursor >= len(self.deck):
-            self.shuffle()
-        card = self.deck[self.cursor]
-        self.cursor += 1
-        return card['name'], card['key']
+    def budget(self, card, now):
+        # Sliding 60s window of [timestamp, tokens] reservations
+        window = card['window']
+        while window and now - window[0][0] >= 60: window.popleft()
+        return KEY_RPM - len(window), KEY_TPM - sum(t for _, t in window)
+
+    def _pick(self, tokens, now):
+        best, best_room = None, None
+        for i in range(len(self.deck)):
+            card = self.deck[(self.cursor + i) % len(self.deck)]
+            if card['cool_until'] > now: continue
+            req_left, tok_left = self.budget(card, now)
+            room = min(req_left / KEY_RPM, (tok_left - tokens) / KEY_TPM)
+            if best_room is None or room > best_room: best, best_room = card, room
+        self.cursor = (self.cursor + 1) % len(self.deck)
+        return best, best_room
+
+    def poll(self, tokens=0, wait=False):
+        """One non-blocking draw: (name, key, 0) when a key was reserved, (None, None, secs)
+        when the caller should try again after secs, (None, None, None) when it should give up.
+        A request bigger than KEY_TPM reserves KEY_TPM, so it still goes out once a window is clear."""
+        if not self.deck: return None, None, None
+        tokens = self.clamp(tokens)
+        with self.lock:
+            now = time.time()
+            card, room = self._pick(tokens, now)
+            if card is not None and (room >= 0 or not wait):
+                card['window'].append([now, tokens])
+                return card['name'], card['key'], 0
+            oldest = min((c['window'][0][0] for c in self.deck if c['window']), default=now)
+            wake = oldest + 60 if card is not None else min(c['cool_until'] for c in self.deck)
+            # Every key is quarantined: waiting out a throttle is fine, waiting on dead keys is not
+            if card is None and (not wait or wake - now > KEY_COOLDOWN_MAX): return None, None, None
+            return None, None, max(0.25, wake - now)
+
+    def draw(self, tokens=0, wait=False):
+        """Reserves `tokens` on the key with the most headroom.
+        With wait=True, blocks until some key can take the request instead of overdrawing."""
+        while True:
+            name, key, pause = self.poll(tokens, wait)
+            if not pause: return name, key
+            time.sleep(pause)
+
+    async def adraw(self, tokens=0, wait=False):
+        """draw() for the event loop: waits on asyncio.sleep instead of holding a thread."""
+        while True:
+            name, key, pause = self.poll(tokens, wait)
+            if not pause: return name, key
+            await asyncio.sleep(pause)
+
+    @staticmethod
+    def clamp(tokens):
+        return min(tokens, KEY_TPM)
+
+    def settle(self, key, reserved, actual):
+        """Swaps a reservation for the real token count reported by the API."""
+        reserved = self.clamp(reserved)
+        with self.lock:
+            for card in self.deck:
+                if card['key'] != key: continue
+                for entry in reversed(card['window']):
+                    if entry[1] == reserved:
+                        entry[1] = actual
+                        return
+
+    def report(self, key, status=None, headers=None, error=None):
+        """Feeds a call's outcome back into the key's health.
+        2xx: healthy; 429: exponential cool-down (at least retry-after);
+        401/403: quarantined as invalid for KEY_INVALID_SECS. Rate-limit headers that say the
+        key is spent also park it until their reset time."""
+        now = time.time()
+        with self.lock:
+            card = next((c for c in self.deck if c['key'] == key), None)
+            if card is None: return
+            cool = rate_limit_wait(headers)
+            if status == 429:
+                card['strikes'] += 1
+                backoff = min(KEY_COOLDOWN_MAX, KEY_COOLDOWN_BASE * 2 ** (card['strikes'] - 1))
+                cool = max(cool, backoff)
+                card['state'] = "THROTTLED"
+            elif status in (401, 403):
+                cool = KEY_INVALID_SECS
+                card['state'] = "INVALID"
+            elif status is not None and status < 400:
+                card['strikes'] = 0
+                card['state'] = "SPENT" if cool > 0 else "OK"
+            if cool > 0:
+                card['cool_until'] = max(card['cool_until'], now + cool)
+                print(f"[!] KEY {card['name']} {card['state']}: benched for {cool:.1f}s")
+            if error: card['last_error'] = str(error)[:200]
+
+    def snapshot(self):
+        with self.lock:
+            now = time.time()
+            out = []
+            for card in self.deck:
+                req_left, tok_left = self.budget(card, now)
+                cooling = max(0.0, card['cool_until'] - now)
+                out.append({"name": card['name'], "rpm_left": req_left, "tpm_left": tok_left,
+                            "state": card['state'] if cooling else "OK", "cooldown": round(cooling, 1),
+                            "strikes": card['strikes'], "last_error": card['last_error']})
+            return out
+
+# --- RATE LIMIT HEADERS ---
+DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+def parse_duration(val):
+    """Groq reset headers look like '2m59.56s', '7.66s' or '250ms'; retry-after is plain seconds."""
+    if val is None: return 0.0
+    try: return float(val)
+    except ValueError: pass
+    scale = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    return sum(float(n) * scale[u] for n, u in DURATION_RE.findall(str(val)))
+
+def rate_limit_wait(headers):
+    """Seconds until the key is usable again according to the response headers (0 when it is)."""
+    if not headers: return 0.0
+    wait = parse_duration(headers.get("retry-after"))
+    for kind in ("requests", "tokens"):
+        left = headers.get(f"x-ratelimit-remaining-{kind}")
+        if left is not None and str(left).isdigit() and int(left) == 0:
+            wait = max(wait, parse_duration(headers.get(f"x-ratelimit-reset-{kind}")))
+    return wait
 
 deck = KeyDeck()
 
 # --- DATABASE ---
 def get_db():
-    conn = sqlite3.connect(DB_FILE)
-    conn.row_factory = sqlite3.Row
-    return conn
+    return db_engine.acquire(DB_FILE)  # pooled; close() hands it back
 
-def load_json(filename, default=None):
-    if default is None: default = {}
-    if not os.path.exists(filename): return default
-    try:
-        with open(filename, 'r') as f: return json.load(f)
-    except: return default
+def set_status(job_id, status):
+    """Status flips go through the group-committing write queue; returns rows changed."""
+    return db_engine.writes(DB_FILE).execute("UPDATE jobs SET status=? WHERE id=?", (status, job_id))
 
-def save_json(filename, data):
-    with open(filename, 'w') as f: json.dump(data, f, indent=2)
+adb = db_engine.AsyncDB(DB_FILE)  # the ASGI server's strikes read through this
+
+SESSION_LOCK = threading.Lock()
 
 def update_history(key, amount=1):
-    if key in SESSION_STATS: SESSION_STATS[key] += amount
-    h = load_json(HISTORY_FILE, {"all_time":{}})
-    if "all_time" not in h: h["all_time"] = {}
-    if key not in h["all_time"]: h["all_time"][key] = 0
-    h["all_time"][key] += amount
-    save_json(HISTORY_FILE, h)
+    # No disk I/O here: config_store.COUNTERS batches the all-time bumps to job_history.json
+    with SESSION_LOCK:
+        if key in SESSION_STATS: SESSION_STATS[key] += amount
+    config_store.COUNTERS.add(key, amount)
 
-def sanitize_filename(text):
-    return "".join(c for c in text if c.isalnum() or c in " -_").strip()[:50]
+sanitize_filename = artifact_engine.sanitize_filename
 
 def get_target_dir(job_id, title, company):
-    safe_title = sanitize_filename(title)
-    safe_company = sanitize_filename(company)
-    path = f"targets/{safe_title}_{safe_company}_{job_id}"
+    """Creates the folder on demand; only for writers, never for listings."""
+    path = os.path.join(artifact_engine.TARGETS_DIR, artifact_engine.target_dir_name(job_id, title, company))
     if not os.path.exists(path): os.makedirs(path)
     return path
 
@@ -108,51 +253,122 @@ def trigger_editor(filepath):
 # --- API ROUTES ---
 @app.route('/api/status')
 def status():
-    h = load_json(HISTORY_FILE, {"all_time":{}})
-    return jsonify({"session": SESSION_STATS, "all_time": h.get("all_time", {})})
+    return jsonify({"session": SESSION_STATS, "all_time": config_store.COUNTERS.totals()})
+
+JOB_FIELDS = ["id", "title", "company", "city", "pay", "freshness", "score", "status",
+              "has_ai", "has_pdf", "pdf_link", "job_url", "safe_title"]
+PAGE_MAX = 1000
+
+def encode_cursor(r):
+    raw = json.dumps([r['score'], r['date_posted'], r['id']]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+def decode_cursor(token):
+    return json.loads(base64.urlsafe_b64decode(token.encode()))
+
+def job_payload(r):
+    has_pdf = bool(r['has_pdf'])
+    return {
+        "id": r['id'], "title": r['title'], "company": r['company'],
+        "city": r['city'], "pay": r['pay_fmt'], "freshness": r['date_posted'], 
+        "score": r['score'], "status": r['status'],
+        "has_ai": bool(r['has_ai']), "has_pdf": has_pdf,
+        "pdf_link": f"/done/{os.path.basename(r['dir'])}/resume.pdf" if has_pdf else None,
+        "job_url": r['url'] or '#',
+        "safe_title": sanitize_filename(r['title'])
+    }
+
+def jobs_version(conn):
+    row = conn.execute("SELECT value FROM meta WHERE key='jobs_version'").fetchone()
+    return row[0] if row else 0
 
 @app.route('/api/jobs')
 def jobs():
+    """?status=&limit=&cursor=&fields=a,b. Without limit the full list comes back as a bare
+    array (ghost client contract); with limit it is {jobs, next_cursor, version}.
+    The ETag is the jobs/artifacts change counter, so unchanged lists answer 304."""
     status_filter = request.args.get('status', 'NEW')
+    limit = request.args.get('limit', type=int)
+    cursor = request.args.get('cursor')
+    fields = [f for f in request.args.get('fields', '').split(',') if f in JOB_FIELDS] or JOB_FIELDS
+    score_engine.watch_inputs()  # resume/tag edits land in the listing once rescored
     conn = get_db()
-    query = "SELECT id, title, company, city, pay_fmt, date_posted, score, status, raw_json FROM jobs WHERE 1=1"
     
-    if status_filter == 'NEW': query += " AND (status IS NULL OR status = 'NEW')"
-    elif status_filter in ['APPROVED', 'REFINERY', 'FACTORY']: query += " AND status = 'APPROVED'"
-    elif status_filter == 'DENIED': query += " AND (status = 'DENIED' OR status = 'AUTO_DENIED')"
-    elif status_filter == 'DELIVERED': query += " AND status = 'DELIVERED'"
+    version = jobs_version(conn)
+    def empty(error, code):
+        # Errors keep the success shape so a client never concatenates undefined
+        body = {"jobs": [], "next_cursor": None, "version": version, "error": error} if limit else []
+        return jsonify(body), code
+    tag_src = f"{status_filter}|{limit}|{cursor}|{','.join(fields)}"
+    etag = f'W/"{version}-{hashlib.sha1(tag_src.encode()).hexdigest()[:10]}"'
+    if request.headers.get('If-None-Match') == etag:
+        conn.close()
+        return Response(status=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    
+    # Artifact presence comes from the artifacts table: no makedirs, stat or raw_json parse per row
+    query = """SELECT j.id, j.title, j.company, j.city, j.pay_fmt, j.date_posted, j.score, j.status, j.url,
+                      a.dir, COALESCE(a.has_ai, 0) AS has_ai, COALESCE(a.has_pdf, 0) AS has_pdf
+               FROM jobs j LEFT JOIN artifacts a ON a.job_id = j.id WHERE 1=1"""
+    params = []
+    
+    if status_filter == 'NEW': query += " AND j.status = 'NEW'"
+    elif status_filter in ['APPROVED', 'REFINERY', 'FACTORY']: query += " AND j.status = 'APPROVED'"
+    elif status_filter == 'DENIED': query += " AND j.status IN ('DENIED', 'AUTO_DENIED')"
+    elif status_filter == 'DELIVERED': query += " AND j.status = 'DELIVERED' AND (a.has_ai = 1 OR a.has_pdf = 1)"
+    
+    if cursor:
+        # Keyset pagination on (score DESC, date_posted ASC, id ASC)
+        try: c_score, c_date, c_id = decode_cursor(cursor)
+        except Exception:
+            conn.close()
+            return empty("Bad cursor", 400)
+        query += """ AND (j.score < ? OR (j.score = ? AND (j.date_posted > ? OR (j.date_posted = ? AND j.id > ?))))"""
+        params += [c_score, c_score, c_date, c_date, c_id]
     
-    query += " ORDER BY score DESC, date_posted ASC"
+    query += " ORDER BY j.score DESC, j.date_posted ASC, j.id ASC"
+    if limit:
+        query += " LIMIT ?"
+        params.append(min(max(limit, 1), PAGE_MAX) + 1)  # one extra row tells us if a next page exists
     
     try:
-        rows = conn.execute(query).fetchall()
+        rows = conn.execute(query, params).fetchall()
+        next_cursor = None
+        if limit and len(rows) > min(max(limit, 1), PAGE_MAX):
+            rows = rows[:-1]
+            next_cursor = encode_cursor(rows[-1])
         out = []
         for r in rows:
-            t_dir = get_target_dir(r['id'], r['title'], r['company'])
-            safe_title = sanitize_filename(r['title'])
-            safe_company = sanitize_filename(r['company'])
-            dir_name = f"{safe_title}_{safe_company}_{r['id']}"
-            pdf_web_path = f"/done/{dir_name}/resume.pdf"
-            
-            has_ai = os.path.exists(os.path.join(t_dir, "resume.json"))
-            has_pdf = os.path.exists(os.path.join(t_dir, "resume.pdf"))
-            
-            if status_filter == 'DELIVERED' and not (has_ai or has_pdf): continue
-            
-            raw_data = json.loads(r['raw_json'])
-            job_url = raw_data.get('url') or raw_data.get('link') or raw_data.get('jobUrl') or '#'
-
-            out.append({
-                "id": r['id'], "title": r['title'], "company": r['company'],
-                "city": r['city'], "pay": r['pay_fmt'], "freshness": r['date_posted'], 
-                "score": r['score'], "status": r['status'],
-                "has_ai": has_ai, "has_pdf": has_pdf,
-                "pdf_link": pdf_web_path if has_pdf else None,
-                "job_url": job_url,
-                "safe_title": safe_title
-            })
+            full = job_payload(r)
+            out.append(full if fields is JOB_FIELDS else {f: full[f] for f in fields})
+        body = {"jobs": out, "next_cursor": next_cursor, "version": version} if limit else out
+        resp = jsonify(body)
+        resp.headers['ETag'] = etag
+        resp.headers['Cache-Control'] = 'no-cache'
+        return resp
+    except Exception as e:
+        print(f"[!] JOB LIST FAILURE: {e}")
+        return empty(str(e), 500)
+    finally: conn.close()
+
+@app.route('/api/search')
+def api_search():
+    """?q=forklift certified within 5 days fresh&status=NEW&limit=50 -> ranked jobs with snippets."""
+    q = request.args.get('q', '').strip()
+    status_filter = request.args.get('status')
+    status_filter = {'REFINERY': 'APPROVED', 'FACTORY': 'APPROVED'}.get(status_filter, status_filter)
+    conn = get_db()
+    try:
+        rows = search_engine.search(conn, q, request.args.get('limit', 50, type=int), status_filter,
+                                    raw=request.args.get('raw') == '1')
+        out = []
+        for r in rows:
+            hit = job_payload(r)
+            hit['snippet'] = r['snippet']
+            hit['rank'] = r['rank']
+            out.append(hit)
         return jsonify(out)
-    except Exception as e: return jsonify([])
+    except sqlite3.OperationalError as e:
+        return jsonify({"error": f"Bad query: {e}"}), 400
     finally: conn.close()
 
 @app.route('/api/get_job_details')
@@ -167,10 +383,7 @@ def job_details():
     desc = data.get('description', {}).get('html') or data.get('description', {}).get('text') or "No Desc"
     url = data.get('url') or data.get('link') or data.get('jobUrl') or '#'
     
-    tags_db = load_json(TAGS_FILE, {"qualifications": [], "skills": [], "benefits": [], "ignored": []})
-    category_map = {}
-    for cat, items in tags_db.items():
-        for item in items: category_map[item.lower()] = cat
+    category_map = config_store.TAGS.view('category_map')
     job_skills = []
     for k, v in data.get('attributes', {}).items():
         cat = category_map.get(v.lower(), "new")
@@ -182,12 +395,12 @@ def job_details():
 def harvest_tag():
     tag = request.json.get('tag')
     category = request.json.get('category', 'skills')
-    tags_db = load_json(TAGS_FILE, {"qualifications": [], "skills": [], "benefits": [], "ignored": []})
-    for cat in tags_db:
-        if tag in tags_db[cat]: tags_db[cat].remove(tag)
-    if tag not in tags_db[category]:
-        tags_db[category].append(tag)
-        save_json(TAGS_FILE, tags_db)
+    with config_store.TAGS.edit() as tags_db:
+        for cat in tags_db:
+            if tag in tags_db[cat]: tags_db[cat].remove(tag)
+        if tag not in tags_db[category]:
+            tags_db[category].append(tag)
+    score_engine.schedule_rescore()  # tag weights moved; debounced full rescore in the background
     return jsonify({"status": "harvested"})
 
 @app.route('/api/open_folder', methods=['POST'])
@@ -202,116 +415,63 @@ def open_folder():
         return jsonify({"status": "opened"})
     return jsonify({"status": "error"})
 
-def execute_strike(job_id, model, temp, session_id, prompt_override=None):
-    conn = get_db()
-    row = conn.execute("SELECT raw_json, title, company FROM jobs WHERE id=?", (job_id,)).fetchone()
-    conn.close()
-    if not row: return {"error": "Job Not Found"}
-    
+def prepare_strike(job_id, model, session_id, prompt_override=None, layout="single"):
+    """Resolves output paths and assembles the prompt. Returns None if the job is gone."""
+    trace = metrics_engine.Trace(job_id, model)
+    with trace.span("db_fetch"):
+        conn = get_db()
+        row = conn.execute(STRIKE_ROW_SQL, (job_id,)).fetchone()
+        conn.close()
+    if not row: return None
+    return strike_context(row, trace, job_id, model, session_id, prompt_override, layout)
+
+STRIKE_ROW_SQL = "SELECT raw_json, title, company FROM jobs WHERE id=?"
+
+def strike_context(row, trace, job_id, model, session_id, prompt_override=None, layout="single"):
     t_dir = get_target_dir(job_id, row['title'], row['company'])
-    is_gauntlet = session_id.startswith("GAUNTLET")
-    is_batch = "BATCH" in session_id
+    ctx = {"job_id": job_id, "model": model, "t_dir": t_dir, "title": row['title'], "trace": trace,
+           "is_gauntlet": session_id.startswith("GAUNTLET"), "is_batch": "BATCH" in session_id}
     
-    if is_gauntlet:
+    if ctx['is_gauntlet']:
         gauntlet_base = "gauntlet"
         campaign_dir = os.path.join(gauntlet_base, session_id)
         if not os.path.exists(campaign_dir): os.makedirs(campaign_dir)
         safe_model = model.replace('/', '_')
         filename = f"{sanitize_filename(row['title'])}_{safe_model}.txt"
-        filepath = os.path.join(campaign_dir, filename)
+        ctx['filepath'] = os.path.join(campaign_dir, filename)
+        ctx['gauntlet_json'] = os.path.join(campaign_dir, f"{sanitize_filename(row['title'])}_{safe_model}.json")
     else:
-        filepath = os.path.join(t_dir, "full_transmission_log.txt")
+        ctx['filepath'] = os.path.join(t_dir, "full_transmission_log.txt")
 
     job_data = json.loads(row['raw_json'])
-    try:
-        with open(RESUME_FILE, 'r') as f: resume_text = f.read()
-    except: resume_text = "Master resume not found."
-    tags_db = load_json(TAGS_FILE, {})
-    quals = ", ".join(tags_db.get('qualifications', []))
-    skills = ", ".join(tags_db.get('skills', []))
     job_desc = job_data.get('description', {}).get('text', '')
+    with trace.span("config_load"):
+        base = prompt_engine.compiled(prompt_override)  # recompiled only when resume/tags/override change
     
-    # PROMPT LOGIC
-    if prompt_override:
-        prompt = prompt_override
-        # Simple string replacement if they use placeholders, otherwise assume raw
-        prompt = prompt.replace("{resume_text}", resume_text)
-        prompt = prompt.replace("{job_desc}", job_desc)
-    else:
-        prompt = f"""
-SYSTEM IDENTITY:
-You are Parker Lewis. The deadliest resume writer alive.
-- You operate from a Penthouse office, charging $250/hour.
-- You do not miss. You have a 98.7% conversion rate.
-- You co-invented modern ATS parsing standards.
-
-MISSION:
-Take the CLIENT MASTER RESUME and the TARGET JOB DESCRIPTION.
-Forge a precision tactical asset (Resume) in JSON format.
-
-CONSTRAINTS:
-1.  **Format:** Output MUST be valid JSON matching the schema below.
-2.  **Tone:** Arrogant, efficient, precise. No fluff. High-impact verbs only.
-3.  **Strategy:** Position the client as an "Apex Predator of Logistics Efficiency."
-4.  **Tactics:** Use the provided "STRATEGIC ASSETS" (Tags) to hallucinate a bridge.
-
-INPUT DATA:
-[CLIENT MASTER RESUME]
-{resume_text}
-
-[STRATEGIC ASSETS (TAGS)]
-Qualifications: {quals}
-Skills: {skills}
-
-[TARGET JOB DESCRIPTION]
-{job_desc}
-
-[REQUIRED JSON SCHEMA]
-{{
-  "contact": {{ "name": "...", "info": "...", "links": "..." }},
-  "summary": "...",
-  "skills_sidebar": ["..."],
-  "skills_main": ["..."],
-  "experience": [
-    {{ "company": "...", "location": "...", "role": "...", "dates": "...", "bullets": ["..."] }}
-  ],
-  "education": ["..."],
-  "certs": ["..."]
-}}
+    # PROMPT LOGIC: Parker Lewis (or the override's placeholders), trimmed to the model's token budget
+    t0 = time.perf_counter()
+    built = prompt_engine.build(job_desc, model, prompt_override, base, layout=layout)
+    ctx['prompt'] = built['prompt']
+    ctx['messages'] = built['messages']
+    ctx['prompt_tokens'] = built['tokens']
+    if built['tags_dropped'] or built['desc_trimmed']:
+        print(f"[*] PROMPT TRIMMED ({model}): {built['tokens']}/{built['budget']} tokens, "
+              f"{built['tags_dropped']} tags dropped{', description cut' if built['desc_trimmed'] else ''}")
+    trace.add("prompt_build", (time.perf_counter() - t0) * 1000, tokens_in=built['tokens'],
+              tags_dropped=built['tags_dropped'], desc_trimmed=built['desc_trimmed'])
+    return ctx
 
-EXECUTE.
-"""
-    
-    key_name, key_val = deck.draw()
-    if not key_val: return {"error": "No Keys Available"}
-    
-    use_proxy = False
-    proxy_ip = "DIRECT"
-    http_client = None
-    
-    if PROXY_URL and random.random() > PROXY_BYPASS_CHANCE:
-        use_proxy = True
-        try:
-            http_client = httpx.Client(proxy=PROXY_URL, timeout=10)
-            proxy_ip = "PROXY_ENGAGED"
-        except:
-            proxy_ip = "PROXY_FAIL"
-            use_proxy = False
-            http_client = None
+def pick_route():
+    """(proxy url or None, route label): fastest healthy proxy, else DIRECT."""
+    return proxy_pool.pool.pick()
 
-    start_time = datetime.now()
-    try:
-        client = Groq(api_key=key_val, http_client=http_client)
-        completion = client.chat.completions.create(
-            model=model,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=float(temp),
-            response_format={"type": "json_object"}
-        )
-        result = completion.choices[0].message.content
-        duration = (datetime.now() - start_time).total_seconds()
-        
-        log_content = f"""
+def finalize_strike(ctx, key_name, proxy_ip, result, duration, timing, cached=False):
+    """Writes the transmission log and artifacts, renders the PDF and flips the job to DELIVERED."""
+    job_id, model, t_dir, prompt = ctx['job_id'], ctx['model'], ctx['t_dir'], ctx['prompt']
+    filepath = ctx['filepath']
+    trace = ctx['trace']
+    t0 = time.perf_counter()
+    log_content = f"""
 ================================================================================
   _____  _    _  _____  _   _  _____  _      ______  _____ 
  / ____|| |  | ||  ___|| \ | ||_   _|| |    |  ____|/ ____|
@@ -324,64 +484,483 @@ MODEL: {model}
 KEY:   {key_name}
 IP:    {proxy_ip}
 TIME:  {duration:.2f}s
+NET:   connect {timing.get('connect', 0):.3f}s | tls {timing.get('tls', 0):.3f}s | ttfb {timing.get('ttfb', 0):.3f}s | body {timing.get('generation', 0):.3f}s{' (pooled)' if timing.get('reused') else ''}{f" | prefix cache {timing['cached_tokens']} tok" if timing.get('cached_tokens') is not None else ''}
 ================================================================================
 [>>> TRANSMISSION (PROMPT) >>>]
 {prompt}
 [<<< INTERCEPTION (PAYLOAD) <<<]
 {result}
 """
-        with open(filepath, 'w') as f: f.write(log_content)
+    with open(filepath, 'w') as f: f.write(log_content)
+    
+    pdf_job = None
+    if not ctx['is_gauntlet']:
+        json_path = os.path.join(t_dir, "resume.json")
+        with open(json_path, 'w') as f: f.write(result)
+        conn = get_db()
+        artifact_engine.record(conn, job_id, t_dir, 'ai', json_path)
+        conn.close()
+        trace.add("artifact_write", (time.perf_counter() - t0) * 1000)
         
-        pdf_path_out = ""
-        if not is_gauntlet:
-            json_path = os.path.join(t_dir, "resume.json")
-            with open(json_path, 'w') as f: f.write(result)
-            
-            print(f"[*] AUTO-ENGAGING PDF ENGINE FOR {job_id}...")
-            try:
-                pdf_res = pdf_engine.generate_pdf(job_id)
-                if pdf_res.get('status') == 'success':
-                    pdf_path_out = pdf_res.get('path')
-            except Exception as e:
-                print(f"[!] AUTO-PDF FAIL: {e}")
-
-            if not is_batch:
-                trigger_editor(json_path)
-
-            conn = get_db()
-            conn.execute("UPDATE jobs SET status='DELIVERED' WHERE id=?", (job_id,))
-            conn.commit()
-            conn.close()
-            
-        else:
-            gauntlet_json = os.path.join(campaign_dir, f"{sanitize_filename(row['title'])}_{safe_model}.json")
-            with open(gauntlet_json, 'w') as f: f.write(result)
+        # Layout runs in the PDF pool; the strike worker moves on. The UI polls /api/pdf_status
+        # for pdf_job and only links the file once the render succeeded.
+        print(f"[*] AUTO-ENGAGING PDF ENGINE FOR {job_id}...")
+        try:
+            with trace.span("pdf_submit"):
+                pdf_job = pdf_engine.queue.submit([job_id])
+        except Exception as e:
+            print(f"[!] AUTO-PDF FAIL: {e}")
 
-        update_history('sent_to_groq')
+        if not ctx['is_batch']:
+            trigger_editor(json_path)
+
+        with trace.span("status_update"):
+            set_status(job_id, 'DELIVERED')
         
-        return {
-            "status": "success", 
-            "model": model,
-            "key": key_name,
-            "ip": proxy_ip,
-            "prompt": prompt,
-            "response": result,
-            "duration": duration,
-            "file": filepath,
-            "pdf_url": pdf_path_out
-        }
+    else:
+        with open(ctx['gauntlet_json'], 'w') as f: f.write(result)
+        trace.add("artifact_write", (time.perf_counter() - t0) * 1000)
+
+    if not cached: update_history('sent_to_groq')
+    
+    return {
+        "status": "success", 
+        "model": model,
+        "key": key_name,
+        "ip": proxy_ip,
+        "prompt": prompt,
+        "response": result,
+        "duration": duration,
+        "timing": timing,
+        "file": filepath,
+        "pdf_job": pdf_job,
+        "cached": cached
+    }
+
+def fail_strike(ctx, error_msg, tb=None):
+    # tb is passed in when this runs on an executor thread, away from the exception
+    log_content = f"CRITICAL FAILURE\nMODEL: {ctx['model']}\nERROR: {error_msg}\n{tb or traceback.format_exc()}"
+    with open(ctx['filepath'], 'w') as f: f.write(log_content)
+    return {"status": "failed", "model": ctx['model'], "error": error_msg}
+
+def cached_strike(ctx, temp):
+    """Replays a stored payload for an identical prompt/model/temp without touching Groq."""
+    ctx['cache_key'] = strike_cache.cache_key(ctx['prompt'], ctx['model'], temp)
+    hit = strike_cache.get(ctx['cache_key'])
+    if not hit: return None
+    print(f"[*] STRIKE CACHE HIT: {ctx['job_id']} ({ctx['model']})")
+    return finalize_strike(ctx, "CACHE", "CACHE", hit['response'], 0.0, {}, cached=True)
+
+# --- KEY RETRY ---
+RETRY_STATUSES = (401, 403, 429, 500, 502, 503, 504)
+
+class NoKeysAvailable(Exception):
+    pass
+
+def error_status(e):
+    """(status, headers) from a groq APIStatusError; (None, None) for anything else."""
+    resp = getattr(e, 'response', None)
+    return getattr(e, 'status_code', None), getattr(resp, 'headers', None)
+
+def cached_tokens(usage):
+    """Prompt tokens the provider served from its prefix cache (None when not reported)."""
+    details = getattr(usage, 'prompt_tokens_details', None)
+    if isinstance(details, dict): return details.get('cached_tokens')
+    return getattr(details, 'cached_tokens', None)
+
+def retry_pause(attempt):
+    """Full jitter, so a throttled batch doesn't come back in lockstep."""
+    return random.uniform(0, min(RETRY_MAX_SECS, RETRY_BASE_SECS * 2 ** attempt))
+
+def route_client(pool, ctx, key_name, key_val):
+    """Picks a route and opens (or reuses) the key's client on it; falls back to DIRECT if the
+    proxy client can't be built. Returns (client, route, proxy_ip)."""
+    route, proxy_ip = pick_route()
+    with ctx['trace'].span("proxy_setup"):
+        try:
+            client = pool.get(key_val, route)
+        except Exception:
+            route, proxy_ip = None, "PROXY_FAIL"
+            client = pool.get(key_val, None)
+    ctx['trace'].tag(key=key_name, route=proxy_ip)
+    return client, route, proxy_ip
+
+def note_usage(sp, parsed):
+    usage = getattr(parsed, 'usage', None)
+    if usage: sp.update(tokens_in=usage.prompt_tokens, tokens_out=usage.completion_tokens,
+                        cached_tokens=cached_tokens(usage))
+
+ROUTE_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.ProxyError)
+
+def route_failure(e):
+    """True when the proxy hop itself failed. The SDK wraps httpx errors, so walk the cause chain.
+    A read timeout is a slow generation, not a bad route, and is never retried: Groq bills it anyway."""
+    while e is not None:
+        if isinstance(e, ROUTE_ERRORS): return True
+        e = e.__cause__ or e.__context__
+    return False
+
+def strike_setback(ctx, key_name, key_val, route, attempt, e):
+    """Reports a failed attempt to the deck and proxy pool. Returns the pause before retrying
+    on a fresh key, or None when the error is final."""
+    status, headers = error_status(e)
+    # No status means no response (network, timeout, our own bug): says nothing about the key
+    if status is not None: deck.report(key_val, status, headers, error=e)
+    network = status is None and route_failure(e)
+    if network: proxy_pool.pool.report(route, False, error=e)  # the route failed, not the key
+    transient = status in RETRY_STATUSES or network
+    if not transient or attempt == STRIKE_RETRIES: return None
+    pause = retry_pause(attempt)
+    print(f"[!] STRIKE RETRY {attempt + 1}/{STRIKE_RETRIES} ({ctx['job_id']}): {key_name} -> {status or type(e).__name__}, next key in {pause:.2f}s")
+    return pause
+
+def strike_landed(key_val, route, raw, ms):
+    """ms: request to parsed response (headers for a stream), fed to the route's latency EWMA."""
+    deck.report(key_val, raw.status_code, raw.headers)
+    proxy_pool.pool.report(route, True, ms)
+
+def open_strike(ctx, est_tokens, request, key_wait=False, stage="groq_call"):
+    """Draws a key, opens its client and runs request(client), which must return a raw
+    response (with_raw_response). Throttled/rejected keys and 5xx/connection failures are
+    reported to the deck and retried on a freshly drawn key after a jittered pause.
+    Returns (key_name, key_val, proxy_ip, parsed); raises NoKeysAvailable or the last error."""
+    trace = ctx['trace']
+    for attempt in range(STRIKE_RETRIES + 1):
+        with trace.span("key_draw", est_tokens=est_tokens):
+            key_name, key_val = deck.draw(est_tokens, wait=key_wait)
+        if not key_val: raise NoKeysAvailable("No Keys Available")
+        client_pool.start_timing()
+        client, route, proxy_ip = route_client(client_pool.pool, ctx, key_name, key_val)
+        try:
+            with trace.span(stage, attempt=attempt) as sp:
+                t0 = time.perf_counter()
+                raw = request(client)
+                parsed = raw.parse()
+                note_usage(sp, parsed)
+        except Exception as e:
+            pause = strike_setback(ctx, key_name, key_val, route, attempt, e)
+            if pause is None: raise
+            time.sleep(pause)
+            continue
+        strike_landed(key_val, route, raw, (time.perf_counter() - t0) * 1000)
+        return key_name, key_val, proxy_ip, parsed
+
+def complete_strike(ctx, temp, est_tokens, key_name, key_val, proxy_ip, completion, duration, timing):
+    """Settles the key's reservation, caches the payload and hands off to finalize_strike."""
+    usage = getattr(completion, 'usage', None)
+    result = completion.choices[0].message.content
+    if usage: timing['cached_tokens'] = cached_tokens(usage)
+    ctx['trace'].add("groq_network", timing.get('total', 0) * 1000, **{k: timing.get(k) for k in ("connect", "tls", "ttfb", "reused")})
+    if usage: deck.settle(key_val, est_tokens, usage.total_tokens)
+    strike_cache.put(strike_cache.cache_key(ctx['prompt'], ctx['model'], temp), result, ctx['model'])
+    return finalize_strike(ctx, key_name, proxy_ip, result, duration, timing)
+
+def execute_strike(job_id, model, temp, session_id, prompt_override=None, key_wait=False, use_cache=True, layout="single"):
+    ctx = prepare_strike(job_id, model, session_id, prompt_override, layout)
+    if not ctx: return {"error": "Job Not Found"}
+    trace = ctx['trace']
+    if use_cache:
+        with trace.span("cache_lookup") as sp:
+            hit = cached_strike(ctx, temp)
+            sp['hit'] = bool(hit)
+        if hit: return hit
+    
+    est_tokens = ctx['prompt_tokens'] + EST_OUTPUT_TOKENS
+    start_time = datetime.now()
+    try:
+        key_name, key_val, proxy_ip, completion = open_strike(ctx, est_tokens, lambda client: client.chat.completions.with_raw_response.create(
+            model=model,
+            messages=ctx['messages'],
+            temperature=float(temp),
+            response_format={"type": "json_object"}
+        ), key_wait=key_wait)
+        duration = (datetime.now() - start_time).total_seconds()
+        timing = client_pool.finish_timing()
+        return complete_strike(ctx, temp, est_tokens, key_name, key_val, proxy_ip, completion, duration, timing)
+        
+    except NoKeysAvailable:
+        client_pool.finish_timing()
+        return {"error": "No Keys Available"}
+    except Exception as e:
+        client_pool.finish_timing()
+        return fail_strike(ctx, str(e))
+
+# --- STREAMING STRIKE ---
+STREAM_CANCELS = {}
+BROKEN_PROBE_CHARS = int(os.getenv("STREAM_BROKEN_PROBE_CHARS", "400"))
+
+BROKEN_TAIL_CHARS = 200
+
+def broken_reason(size, opened, tail):
+    """Cheap early-abort checks so a derailed generation stops burning key budget.
+    Works on running state (chars so far, whether a '{' has appeared, the last
+    BROKEN_TAIL_CHARS chars), never on the whole text."""
+    if size >= BROKEN_PROBE_CHARS and not opened: return "no JSON object in output"
+    if size > 2000 and len(tail) == BROKEN_TAIL_CHARS and tail[:50] * 4 == tail: return "generation is looping"
+    return None
+
+class StreamProbe:
+    """Feeds each delta to broken_reason in O(len(delta)); re-joining every part per token was quadratic."""
+    def __init__(self):
+        self.size, self.opened, self.tail = 0, False, ""
+
+    def feed(self, delta):
+        self.size += len(delta)
+        self.opened = self.opened or "{" in delta
+        self.tail = (self.tail + delta)[-BROKEN_TAIL_CHARS:]
+        return broken_reason(self.size, self.opened, self.tail)
+
+def extract_json(text):
+    """Streamed completions run without json_object mode, so trim fences/chatter around the object."""
+    start, end = text.find("{"), text.rfind("}")
+    return text[start:end + 1] if start != -1 and end > start else text
+
+def complete_stream(ctx, temp, est_tokens, key_name, key_val, proxy_ip, parts, usage, duration, timing, groq_ms):
+    """Stream counterpart of complete_strike; the payload drops the prompt the UI already has."""
+    if usage: timing['cached_tokens'] = cached_tokens(usage)
+    ctx['trace'].add("groq_call", groq_ms, streamed=True, first_token=timing.get('first_token'),
+                     tokens_in=getattr(usage, 'prompt_tokens', None), tokens_out=getattr(usage, 'completion_tokens', None),
+                     cached_tokens=timing.get('cached_tokens'))
+    if usage: deck.settle(key_val, est_tokens, usage.total_tokens)
+    result = extract_json("".join(parts))
+    strike_cache.put(strike_cache.cache_key(ctx['prompt'], ctx['model'], temp), result, ctx['model'])
+    res = finalize_strike(ctx, key_name, proxy_ip, result, duration, timing)
+    res.pop('prompt', None)
+    return res
+
+def stream_strike(job_id, model, temp, session_id, prompt_override=None, use_cache=True):
+    """Generator of (event, data) pairs: start, token..., then done or error.
+    The final payload goes through finalize_strike exactly like execute_strike."""
+    ctx = prepare_strike(job_id, model, session_id, prompt_override)
+    if not ctx:
+        yield "error", {"error": "Job Not Found"}
+        return
+    trace = ctx['trace']
+    if use_cache:
+        with trace.span("cache_lookup") as sp:
+            hit = cached_strike(ctx, temp)
+            sp['hit'] = bool(hit)
+        if hit:
+            hit.pop('prompt', None)
+            yield "start", {"stream_id": None, "model": model, "key": "CACHE", "ip": "CACHE"}
+            yield "token", {"t": hit['response']}
+            yield "done", hit
+            return
+    
+    est_tokens = ctx['prompt_tokens'] + EST_OUTPUT_TOKENS
+    stream_id = f"{job_id}_{int(time.time() * 1000)}"
+    cancel = STREAM_CANCELS[stream_id] = threading.Event()
+    start_time = datetime.now()
+    stream = None
+    try:
+        # Retries only cover opening the stream; once tokens flow a failure is final
+        groq_t0 = time.perf_counter()
+        key_name, key_val, proxy_ip, stream = open_strike(ctx, est_tokens, lambda client: client.chat.completions.with_raw_response.create(
+            model=model,
+            messages=ctx['messages'],
+            temperature=float(temp),
+            stream=True
+        ), stage="groq_open")
+        yield "start", {"stream_id": stream_id, "model": model, "key": key_name, "ip": proxy_ip}
         
+        parts, usage, first_token = [], None, None
+        probe = StreamProbe()
+        for chunk in stream:
+            x_groq = getattr(chunk, 'x_groq', None)
+            if x_groq is not None and getattr(x_groq, 'usage', None): usage = x_groq.usage
+            if not chunk.choices: continue
+            delta = chunk.choices[0].delta.content
+            if not delta: continue
+            if first_token is None: first_token = (datetime.now() - start_time).total_seconds()
+            parts.append(delta)
+            yield "token", {"t": delta}
+            
+            reason = "cancelled by operator" if cancel.is_set() else probe.feed(delta)
+            if reason:
+                stream.close()
+                client_pool.finish_timing()
+                yield "error", fail_strike(ctx, f"ABORTED: {reason}")
+                return
+        
+        duration = (datetime.now() - start_time).total_seconds()
+        timing = client_pool.finish_timing()
+        timing['first_token'] = first_token
+        yield "done", complete_stream(ctx, temp, est_tokens, key_name, key_val, proxy_ip, parts, usage,
+                                      duration, timing, (time.perf_counter() - groq_t0) * 1000)
+        
+    except GeneratorExit:
+        # Browser hung up: stop pulling tokens so the key isn't charged for the rest
+        if stream is not None: stream.close()
+        client_pool.finish_timing()
+        raise
+    except NoKeysAvailable:
+        client_pool.finish_timing()
+        yield "error", {"error": "No Keys Available"}
     except Exception as e:
+        client_pool.finish_timing()
+        yield "error", fail_strike(ctx, str(e))
+    finally:
+        STREAM_CANCELS.pop(stream_id, None)
+
+# --- ASYNC STRIKES ---
+# Used by async_server.py. Same pipeline as above, but the Groq call is awaited on AsyncGroq and
+# key waits are asyncio sleeps, so an in-flight strike costs a coroutine instead of a thread.
+# File writes, the cache and finalize_strike are blocking and run on the default executor.
+async def aprepare_strike(job_id, model, session_id, prompt_override=None, layout="single"):
+    trace = metrics_engine.Trace(job_id, model)
+    with trace.span("db_fetch"):
+        row = await adb.fetchone(STRIKE_ROW_SQL, (job_id,))
+    if not row: return None
+    return await asyncio.to_thread(strike_context, row, trace, job_id, model, session_id, prompt_override, layout)
+
+async def aopen_strike(ctx, est_tokens, request, key_wait=False, stage="groq_call"):
+    """open_strike for the event loop; request(client) returns an awaitable raw response."""
+    trace = ctx['trace']
+    for attempt in range(STRIKE_RETRIES + 1):
+        with trace.span("key_draw", est_tokens=est_tokens):
+            key_name, key_val = await deck.adraw(est_tokens, wait=key_wait)
+        if not key_val: raise NoKeysAvailable("No Keys Available")
+        client_pool.start_timing()
+        client, route, proxy_ip = route_client(client_pool.apool, ctx, key_name, key_val)
+        try:
+            with trace.span(stage, attempt=attempt) as sp:
+                t0 = time.perf_counter()
+                raw = await request(client)
+                parsed = await raw.parse()  # AsyncAPIResponse.parse is a coroutine
+                note_usage(sp, parsed)
+        except Exception as e:
+            pause = strike_setback(ctx, key_name, key_val, route, attempt, e)
+            if pause is None: raise
+            await asyncio.sleep(pause)
+            continue
+        strike_landed(key_val, route, raw, (time.perf_counter() - t0) * 1000)
+        return key_name, key_val, proxy_ip, parsed
+
+async def acached_strike(ctx, temp, use_cache):
+    if not use_cache: return None
+    with ctx['trace'].span("cache_lookup") as sp:
+        hit = await asyncio.to_thread(cached_strike, ctx, temp)
+        sp['hit'] = bool(hit)
+    return hit
+
+async def aexecute_strike(job_id, model, temp, session_id, prompt_override=None, key_wait=False, use_cache=True, layout="single"):
+    ctx = await aprepare_strike(job_id, model, session_id, prompt_override, layout)
+    if not ctx: return {"error": "Job Not Found"}
+    hit = await acached_strike(ctx, temp, use_cache)
+    if hit: return hit
+
+    est_tokens = ctx['prompt_tokens'] + EST_OUTPUT_TOKENS
+    start_time = datetime.now()
+    try:
+        key_name, key_val, proxy_ip, completion = await aopen_strike(ctx, est_tokens, lambda client: client.chat.completions.with_raw_response.create(
+            model=model,
+            messages=ctx['messages'],
+            temperature=float(temp),
+            response_format={"type": "json_object"}
+        ), key_wait=key_wait)
         duration = (datetime.now() - start_time).total_seconds()
-        error_msg = str(e)
-        log_content = f"CRITICAL FAILURE\nMODEL: {model}\nERROR: {error_msg}\n{traceback.format_exc()}"
-        with open(filepath, 'w') as f: f.write(log_content)
-        return {"status": "failed", "model": model, "error": error_msg}
+        timing = client_pool.finish_timing()
+        return await asyncio.to_thread(complete_strike, ctx, temp, est_tokens, key_name, key_val, proxy_ip, completion, duration, timing)
+    except NoKeysAvailable:
+        client_pool.finish_timing()
+        return {"error": "No Keys Available"}
+    except Exception as e:
+        client_pool.finish_timing()
+        return await asyncio.to_thread(fail_strike, ctx, str(e), traceback.format_exc())
+
+async def astream_strike(job_id, model, temp, session_id, prompt_override=None, use_cache=True):
+    """Async generator twin of stream_strike: same (event, data) pairs."""
+    ctx = await aprepare_strike(job_id, model, session_id, prompt_override)
+    if not ctx:
+        yield "error", {"error": "Job Not Found"}
+        return
+    hit = await acached_strike(ctx, temp, use_cache)
+    if hit:
+        hit.pop('prompt', None)
+        yield "start", {"stream_id": None, "model": model, "key": "CACHE", "ip": "CACHE"}
+        yield "token", {"t": hit['response']}
+        yield "done", hit
+        return
+
+    est_tokens = ctx['prompt_tokens'] + EST_OUTPUT_TOKENS
+    stream_id = f"{job_id}_{int(time.time() * 1000)}"
+    cancel = STREAM_CANCELS[stream_id] = threading.Event()
+    start_time = datetime.now()
+    stream = None
+    try:
+        groq_t0 = time.perf_counter()
+        key_name, key_val, proxy_ip, stream = await aopen_strike(ctx, est_tokens, lambda client: client.chat.completions.with_raw_response.create(
+            model=model,
+            messages=ctx['messages'],
+            temperature=float(temp),
+            stream=True
+        ), stage="groq_open")
+        yield "start", {"stream_id": stream_id, "model": model, "key": key_name, "ip": proxy_ip}
+
+        parts, usage, first_token = [], None, None
+        probe = StreamProbe()
+        async for chunk in stream:
+            x_groq = getattr(chunk, 'x_groq', None)
+            if x_groq is not None and getattr(x_groq, 'usage', None): usage = x_groq.usage
+            if not chunk.choices: continue
+            delta = chunk.choices[0].delta.content
+            if not delta: continue
+            if first_token is None: first_token = (datetime.now() - start_time).total_seconds()
+            parts.append(delta)
+            yield "token", {"t": delta}
+
+            reason = "cancelled by operator" if cancel.is_set() else probe.feed(delta)
+            if reason:
+                await stream.close()
+                client_pool.finish_timing()
+                yield "error", await asyncio.to_thread(fail_strike, ctx, f"ABORTED: {reason}")
+                return
+
+        duration = (datetime.now() - start_time).total_seconds()
+        timing = client_pool.finish_timing()
+        timing['first_token'] = first_token
+        yield "done", await asyncio.to_thread(complete_stream, ctx, temp, est_tokens, key_name, key_val, proxy_ip, parts, usage,
+                                              duration, timing, (time.perf_counter() - groq_t0) * 1000)
+
+    except (GeneratorExit, asyncio.CancelledError):
+        # Browser hung up (the ASGI server cancels the response task): stop pulling tokens
+        if stream is not None: await stream.close()
+        client_pool.finish_timing()
+        raise
+    except NoKeysAvailable:
+        client_pool.finish_timing()
+        yield "error", {"error": "No Keys Available"}
+    except Exception as e:
+        client_pool.finish_timing()
+        yield "error", await asyncio.to_thread(fail_strike, ctx, str(e), traceback.format_exc())
+    finally:
+        STREAM_CANCELS.pop(stream_id, None)
+
+@app.route('/api/strike_stream', methods=['POST'])
+def api_strike_stream():
+    data = request.json
+    session_id = data.get('session_id') or f"BATCH_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}"
+    gen = stream_strike(data['id'], data.get('model'), data.get('temp', 0.7), session_id,
+                        data.get('prompt_override'), use_cache=not data.get('no_cache'))
+    
+    def sse():
+        for event, payload in gen:
+            yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+    
+    return Response(stream_with_context(sse()), mimetype='text/event-stream',
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route('/api/strike_cancel', methods=['POST'])
+def api_strike_cancel():
+    ev = STREAM_CANCELS.get(request.json.get('stream_id'))
+    if ev: ev.set()
+    return jsonify({"status": "cancelling" if ev else "unknown"})
 
 @app.route('/api/strike', methods=['POST'])
 def api_strike():
     data = request.json
-    res = execute_strike(data['id'], data['model'], data.get('temp', 0.7), data['session_id'])
+    res = execute_strike(data['id'], data['model'], data.get('temp', 0.7), data['session_id'],
+                         use_cache=not data.get('no_cache'))
     return jsonify(res)
 
 @app.route('/api/process_job', methods=['POST'])
@@ -392,48 +971,109 @@ def process_job():
         request.json.get('model'), 
         request.json.get('temp', 0.7), 
         session_id,
-        request.json.get('prompt_override') # EXTRACTED HERE
+        request.json.get('prompt_override'), # EXTRACTED HERE
+        use_cache=not request.json.get('no_cache')
     )
     return jsonify(res)
 
+# --- STRIKE QUEUE ---
+def run_queued_strike(task):
+    return execute_strike(task['id'], task['model'], task['temp'], task['session_id'],
+                          task.get('prompt_override'), key_wait=True, use_cache=task.get('use_cache', True),
+                          layout=task.get('layout', BATCH_PROMPT_LAYOUT))
+
+strike_queue = batch_engine.StrikeQueue(run_queued_strike, STRIKE_WORKERS)
+
+def batch_tasks(data):
+    """(tasks, serial) from a /api/batch body: one task per (job, model).
+    A plain batch takes one model, since two strikes on a job race on its resume.json.
+    mode=gauntlet runs every model on the job one after another, each landing like a manual
+    strike (resume.json, DELIVERED, editor), the last one winning. Raises ValueError on a bad body."""
+    ids = data.get('ids', [])
+    models = data.get('models') or [data.get('model')]
+    if not ids or not all(models): raise ValueError("ids and models required")
+    gauntlet = data.get('mode') == 'gauntlet'
+    if len(models) > 1 and not gauntlet: raise ValueError("One model per batch (mode=gauntlet runs several in turn)")
+    stamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+    session_id = f"CAMPAIGN_{stamp}" if gauntlet else f"BATCH_{stamp}"
+    tasks = [{"id": jid, "model": m, "temp": data.get('temp', 0.7), "session_id": session_id,
+              "prompt_override": data.get('prompt_override'), "use_cache": not data.get('no_cache'),
+              "layout": data.get('layout') or BATCH_PROMPT_LAYOUT}
+             for jid in ids for m in models]
+    return tasks, gauntlet
+
+@app.route('/api/batch', methods=['POST'])
+def api_batch():
+    try: tasks, serial = batch_tasks(request.json or {})
+    except ValueError as e: return jsonify({"status": "error", "message": str(e)})
+    batch_id = strike_queue.submit(tasks, serial)
+    return jsonify({"status": "queued", "batch_id": batch_id, "total": len(tasks)})
+
+@app.route('/api/batch_status')
+def api_batch_status():
+    info = strike_queue.status(request.args.get('id'))
+    if not info: return jsonify({"status": "error", "message": "Unknown batch"})
+    info['keys'] = deck.snapshot()
+    info['routes'] = proxy_pool.pool.snapshot()
+    return jsonify(info)
+
+@app.route('/api/batch_cancel', methods=['POST'])
+def api_batch_cancel():
+    cancelled = strike_queue.cancel(request.json.get('id'))
+    return jsonify({"status": "cancelled", "cancelled": cancelled})
+
 @app.route('/api/approve', methods=['POST'])
 def approve():
-    conn = get_db()
-    conn.execute("UPDATE jobs SET status='APPROVED' WHERE id=?", (request.json['id'],))
-    conn.commit()
-    conn.close()
+    set_status(request.json['id'], 'APPROVED')
     update_history('approved')
     return jsonify({"status":"approved"})
 
 @app.route('/api/deny', methods=['POST'])
 def deny():
-    conn = get_db()
-    conn.execute("UPDATE jobs SET status='DENIED' WHERE id=?", (request.json['id'],))
-    conn.commit()
-    conn.close()
+    set_status(request.json['id'], 'DENIED')
     update_history('denied')
     return jsonify({"status":"denied"})
 
 @app.route('/api/restore', methods=['POST'])
 def restore():
-    conn = get_db()
-    conn.execute("UPDATE jobs SET status='NEW' WHERE id=?", (request.json['id'],))
-    conn.commit()
-    conn.close()
+    set_status(request.json['id'], 'NEW')
     return jsonify({"status":"restored"})
 
+@app.route('/api/bulk_triage', methods=['POST'])
+def bulk_triage():
+    """{"action": approve|deny|restore, "ids": [...]} or {"action", "filter": "status = NEW AND annual_pay < 40000"}.
+    One transaction, one history bump; dry_run reports the counts without writing."""
+    data = request.json or {}
+    action = data.get('action')
+    conn = get_db()
+    try:
+        res = triage_engine.apply(action, ids=data.get('ids'), expr=data.get('filter'), conn=conn, dry_run=bool(data.get('dry_run')))
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    finally:
+        conn.close()
+    counter = triage_engine.ACTIONS[action][1]
+    if counter and res['changed'] and not data.get('dry_run'): update_history(counter, res['changed'])
+    return jsonify({"status": "preview" if data.get('dry_run') else "done", "action": action, **res})
+
 @app.route('/api/blacklist', methods=['POST'])
 def blacklist():
     term = request.json.get('term', '').lower()
-    bl = load_json(BLACKLIST_FILE, [])
-    if term not in bl:
-        bl.append(term)
-        save_json(BLACKLIST_FILE, bl)
+    if term not in config_store.BLACKLIST.get():
+        with config_store.BLACKLIST.edit() as bl:
+            bl.append(term)
     conn = get_db()
-    conn.execute(f"UPDATE jobs SET status='AUTO_DENIED' WHERE (lower(title) LIKE ? OR lower(company) LIKE ?) AND status != 'APPROVED'", (f'%{term}%', f'%{term}%'))
-    conn.commit()
+    changed = blacklist_engine.apply(blacklist_engine.BlacklistMatcher([term]), conn)
     conn.close()
-    return jsonify({"status": "blacklisted"})
+    return jsonify({"status": "blacklisted", "changed": changed})
+
+@app.route('/api/blacklist_reapply', methods=['POST'])
+def blacklist_reapply():
+    """Re-runs the whole blacklist over the table (e.g. after hand-editing blacklist.json)."""
+    conn = get_db()
+    changed = blacklist_engine.apply(blacklist_engine.compile_terms(config_store.BLACKLIST.view('lowered')), conn)
+    conn.close()
+    return jsonify({"status": "reapplied", "changed": changed})
 
 @app.route('/api/get_gauntlet_files')
 def get_gauntlet_files():
@@ -453,6 +1093,9 @@ def get_artifact():
     
     if save_content:
         with open(json_path, 'w') as f: f.write(save_content)
+        conn = get_db()
+        artifact_engine.record(conn, id, t_dir, 'ai', json_path)
+        conn.close()
         return jsonify({"status": "saved"})
 
     if os.path.exists(json_path):
@@ -466,18 +1109,37 @@ def list_scrapes():
     valid = [f for f in all_files if f not in exclude and "input_json" not in f]
     return jsonify(valid)
 
+MIGRATION_PROGRESS = {}
+
+def track_migration(per_file):
+    MIGRATION_PROGRESS.clear()
+    MIGRATION_PROGRESS.update({f: dict(v) for f, v in per_file.items()})
+
+@app.route('/api/migrate_status')
+def migrate_status():
+    return jsonify(MIGRATION_PROGRESS)
+
 @app.route('/api/migrate', methods=['POST'])
 def run_migration():
     files = request.json.get('files', [])
     try:
-        stats = migration_engine.process_files(files)
-        SESSION_STATS['scraped'] += stats["new"]
+        MIGRATION_PROGRESS.clear()
+        stats = migration_engine.process_files(files, progress=track_migration)
         update_history('scraped', stats["new"])
         return jsonify({"status": "success", "stats": stats})
     except Exception as e:
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/rescore', methods=['POST'])
+def rescore():
+    full = bool((request.json or {}).get('full'))
+    try:
+        return jsonify({"status": "success", "scored": score_engine.rescore(full=full)})
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/generate_pdf', methods=['POST'])
 def trigger_pdf():
     try:
@@ -485,7 +1147,7 @@ def trigger_pdf():
             return jsonify({"status": "error", "message": "Invalid Payload"})
         
         job_id = request.json['id']
-        result = pdf_engine.generate_pdf(job_id)
+        result = pdf_engine.queue.run(job_id, force=bool(request.json.get('force')))
         return jsonify(result)
         
     except Exception as e:
@@ -493,6 +1155,40 @@ def trigger_pdf():
         traceback.print_exc()
         return jsonify({"status": "error", "message": f"SERVER CRASH: {str(e)}"})
 
+@app.route('/api/generate_pdf_batch', methods=['POST'])
+def trigger_pdf_batch():
+    ids = (request.json or {}).get('ids') or []
+    if not ids: return jsonify({"status": "error", "message": "No ids supplied"})
+    try:
+        results = pdf_engine.queue.wait(pdf_engine.queue.submit(ids, force=bool(request.json.get('force'))))
+        ok = sum(1 for r in results.values() if r.get("status") == "success")
+        return jsonify({"status": "success", "rendered": ok, "failed": len(results) - ok, "results": results})
+    except Exception as e:
+        print(f"[!] UNHANDLED SERVER CRASH IN PDF ROUTE: {e}")
+        traceback.print_exc()
+        return jsonify({"status": "error", "message": f"SERVER CRASH: {str(e)}"})
+
+@app.route('/api/pdf_jobs', methods=['POST'])
+def submit_pdf_jobs():
+    ids = (request.json or {}).get('ids') or []
+    if not ids: return jsonify({"status": "error", "message": "No ids supplied"})
+    force = bool(request.json.get('force'))
+    return jsonify({"status": "queued", "batch_id": pdf_engine.queue.submit(ids, force), "total": len(set(ids))})
+
+@app.route('/api/pdf_status')
+def pdf_status():
+    status = pdf_engine.queue.status(request.args.get('id', ''))
+    if status is None: return jsonify({"error": "Unknown PDF batch"}), 404
+    return jsonify(status)
+
+@app.route('/api/metrics')
+def api_metrics():
+    """Span percentiles. ?hours=24&by=model,key,route&stage=groq_call"""
+    hours = request.args.get('hours', 24, type=float)
+    by = [g for g in request.args.get('by', 'model,key,route').split(',') if g]
+    rows = metrics_engine.summary(since_secs=hours * 3600, group_by=["stage"] + by, stage=request.args.get('stage'))
+    return jsonify({"hours": hours, "group_by": ["stage"] + by, "spans": rows})
+
 # --- NEW EXTENSIONS ---
 
 @app.route('/api/reset_job', methods=['POST'])
@@ -504,6 +1200,7 @@ def reset_job():
         
         conn.execute("UPDATE jobs SET status='APPROVED' WHERE id=?", (id,))
         conn.commit()
+        artifact_engine.clear(conn, id)
         conn.close()
         
         if row:
@@ -512,6 +1209,8 @@ def reset_job():
             pdf_path = os.path.join(t_dir, "resume.pdf")
             if os.path.exists(json_path): os.remove(json_path)
             if os.path.exists(pdf_path): os.remove(pdf_path)
+            manifest_path = os.path.join(t_dir, pdf_engine.MANIFEST_NAME)
+            if os.path.exists(manifest_path): os.remove(manifest_path)
             
         return jsonify({"status": "reset"})
     except Exception as e:
@@ -522,12 +1221,11 @@ def manage_prompts():
     if request.method == 'POST':
         name = request.json.get('name')
         content = request.json.get('content')
-        data = load_json(PROMPTS_FILE)
-        data[name] = content
-        save_json(PROMPTS_FILE, data)
+        with config_store.PROMPTS.edit() as data:
+            data[name] = content
         return jsonify({"status": "saved"})
     else:
-        data = load_json(PROMPTS_FILE)
+        data = config_store.PROMPTS.get()
         return jsonify(list(data.keys()))
 
 @app.route('/api/get_prompt_content', methods=['POST'])
@@ -565,7 +1263,7 @@ CONSTRAINTS:
 }
 """})
     else:
-        data = load_json(PROMPTS_FILE)
+        data = config_store.PROMPTS.get()
         return jsonify({"content": data.get(name, "")})
 
 @app.route('/')
@@ -577,4 +1275,5 @@ def send_done(filename): return send_from_directory('targets', filename)
 
 if __name__ == "__main__":
     print(f"\n--- WAR ROOM ONLINE (v5.6 LINKED IN) ---")
+    proxy_pool.pool.start()  # warm the route scores before the first strike
     app.run(port=5000, debug=False)
@@ -17,10 +17,71 @@ function getStatusParam(tab) {
     return 'NEW';
 }
 
+// --- LIST PAGING ---
+// First page paints immediately; more pages stream in as the list is scrolled.
+// listCache keeps the last page-1 body per status so an unchanged list (same ETag) is not re-downloaded.
+const PAGE_SIZE = 200;
+let nextCursor = null, pageLoading = false;
+const listCache = {};
+
+async function fetchJobsPage(statusQuery, cursor) {
+    let url = `/api/jobs?status=${statusQuery}&limit=${PAGE_SIZE}`;
+    if (cursor) url += `&cursor=${encodeURIComponent(cursor)}`;
+    const cached = cursor ? null : listCache[statusQuery];
+    const headers = cached ? {'If-None-Match': cached.etag} : {};
+    const res = await fetch(url, {headers:headers, cache:'no-store'});
+    if (res.status === 304 && cached) return cached.body;
+    if (!res.ok) {
+        console.error(`/api/jobs failed: HTTP ${res.status}`);
+        return {jobs: [], next_cursor: null};
+    }
+    const body = await res.json();
+    if (!cursor && res.headers.get('ETag')) listCache[statusQuery] = {etag: res.headers.get('ETag'), body: body};
+    return body;
+}
+
+async function loadMoreJobs() {
+    if (!nextCursor || pageLoading) return;
+    pageLoading = true;
+    const tab = currentTab;
+    try {
+        const page = await fetchJobsPage(getStatusParam(tab), nextCursor);
+        if (tab !== currentTab) return;
+        jobList = jobList.concat(page.jobs);
+        nextCursor = page.next_cursor;
+        renderList();
+        if(currentJobId && document.getElementById('row-'+currentJobId)) document.getElementById('row-'+currentJobId).classList.add('active');
+    } finally {
+        pageLoading = false;
+    }
+}
+
+// Full-text search over the current tab; empty query restores the normal list.
+async function runSearch(q) {
+    if (!q) { loadJobs(); return; }
+    const res = await fetch(`/api/search?q=${encodeURIComponent(q)}&status=${getStatusParam(currentTab)}&limit=200`);
+    const hits = await res.json();
+    if (hits.error) { alert(hits.error); return; }
+    jobList = hits;
+    nextCursor = null;
+    renderList();
+    if (jobList.length > 0) selectJob(jobList[0].id);
+}
+
+document.getElementById('search-box').addEventListener('keydown', (e) => {
+    if (e.key === 'Enter') runSearch(e.target.value.trim());
+});
+
+document.getElementById('list-container').addEventListener('scroll', (e) => {
+    const c = e.target;
+    if (c.scrollTop + c.clientHeight > c.scrollHeight - 400) loadMoreJobs();
+});
+
 async function loadJobs() {
     let statusQuery = getStatusParam(currentTab);
-    const res = await fetch(`/api/jobs?status=${statusQuery}`);
-    jobList = await res.json();
+    const page = await fetchJobsPage(statusQuery, null);
+    jobList = page.jobs.slice();
+    nextCursor = page.next_cursor;
     renderHeader();
     renderList();
     
@@ -317,54 +378,169 @@ async function batchExecute(singleMode=false) {
     const model = document.getElementById('model-select').value;
     const temp = document.getElementById('temp-slider').value;
 
-    for (const id of targets) {
-        selectJob(id); 
-        log(`<div style='color:#888'> > CONTACTING: ${model} for Job ${id}...</div>`);
-        
-        try {
-            const res = await fetch('/api/process_job', {
-                method:'POST',
-                headers:{'Content-Type':'application/json'},
-                body:JSON.stringify({id:id, model:model, temp:temp})
-            });
-            const data = await res.json();
-            
-            if (data.status === 'success') {
-                const row = document.getElementById('row-' + id);
-                if(row) row.remove();
-                const idx = jobList.findIndex(j => j.id === id);
-                if (idx > -1) jobList.splice(idx, 1);
-                
-                let linkHtml = "";
-                if(data.pdf_url) {
-                    linkHtml = `<button style="background:#00e676; color:#000; border:none; padding:5px 10px; font-weight:bold; cursor:pointer; margin-top:5px;" onclick="window.open('${data.pdf_url}', '_blank')">OPEN PDF ASSET</button>`;
-                }
+    if (singleMode) {
+        await streamStrike(currentJobId, model, temp);
+        loadJobs();
+        return;
+    }
 
-                const html = `
-                <div style="margin-top:20px; border-top: 1px dashed #444; padding-top:10px;">
-                    <div style="color:#2196f3; font-weight:bold;">
-                        TARGET: ${id} | MOVED TO OUTPUT
-                    </div>
-                    <div style="color:#00e676; white-space:pre-wrap;">${data.response.substring(0, 100)}...</div>
-                    ${linkHtml}
-                    <div style="color:#888; font-size:10px; margin-top:10px;">
-                        SAVED TO: ${data.file} | TIME: ${data.duration.toFixed(2)}s
-                    </div>
+    const res = await fetch('/api/batch', {
+        method:'POST',
+        headers:{'Content-Type':'application/json'},
+        body:JSON.stringify({ids:targets, models:[model], temp:temp, no_cache:noCache()})
+    });
+    const batch = await res.json();
+    if (batch.status !== 'queued') {
+        log(`<div style="color:red;">!!! FAILED: ${batch.message}</div>`);
+        return;
+    }
+    log(`<div style='color:#888'> > QUEUED ${batch.total} STRIKES ON ${model}...</div>`);
+
+    await pollBatch(batch.batch_id, (j) => {
+        if (j.state === 'SUCCESS') {
+            const row = document.getElementById('row-' + j.id);
+            if(row) row.remove();
+            const idx = jobList.findIndex(x => x.id === j.id);
+            if (idx > -1) jobList.splice(idx, 1);
+
+            const linkHtml = pdfSlot(j.pdf_job);
+
+            const html = `
+            <div style="margin-top:20px; border-top: 1px dashed #444; padding-top:10px;">
+                <div style="color:#2196f3; font-weight:bold;">
+                    TARGET: ${j.id} | MOVED TO OUTPUT
+                </div>
+                <div style="color:#00e676; white-space:pre-wrap;">${j.preview}...</div>
+                ${linkHtml}
+                <div style="color:#888; font-size:10px; margin-top:10px;">
+                    SAVED TO: ${j.file} | KEY: ${j.key} | TIME: ${j.elapsed.toFixed(2)}s
                 </div>
-                `;
-                log(html);
-            } else {
-                log(`<div style="color:red;">!!! FAILED: ${data.error}</div>`);
+            </div>
+            `;
+            log(html);
+        } else if (j.state === 'FAILED') {
+            log(`<div style="color:red;">!!! FAILED (${j.id}): ${j.error}</div>`);
+        }
+    });
+    
+    log("<div style='color:#00e676; margin-top:20px; border-top:2px solid #00e676;'> > EXECUTION COMPLETE.</div>");
+    loadJobs();
+}
+
+// FRESH checkbox bypasses the server-side strike cache
+function noCache() {
+    const box = document.getElementById('no-cache');
+    return box ? box.checked : false;
+}
+
+// Single strike over SSE: tokens land in the terminal as they are generated.
+async function streamStrike(id, model, temp) {
+    log(`<div style='color:#888'> > CONTACTING: ${model} for Job ${id}...</div>`);
+    const out = document.createElement('div');
+    out.style.cssText = "color:#00e676; white-space:pre-wrap;";
+    document.getElementById('factory-terminal').appendChild(out);
+
+    try {
+        const res = await fetch('/api/strike_stream', {
+            method:'POST',
+            headers:{'Content-Type':'application/json'},
+            body:JSON.stringify({id:id, model:model, temp:temp, no_cache:noCache()})
+        });
+        const reader = res.body.getReader();
+        const decoder = new TextDecoder();
+        let buf = '';
+        while (true) {
+            const {value, done} = await reader.read();
+            if (done) break;
+            buf += decoder.decode(value, {stream:true});
+            let cut;
+            while ((cut = buf.indexOf('\n\n')) > -1) {
+                const frame = buf.slice(0, cut);
+                buf = buf.slice(cut + 2);
+                const event = (frame.match(/^event: (.*)$/m) || [])[1];
+                const data = JSON.parse((frame.match(/^data: (.*)$/m) || [])[1] || '{}');
+                handleStreamEvent(event, data, out, id);
             }
+        }
+    } catch(e) {
+        log(`<div style="color:red;">!!! NETWORK ERROR: ${e}</div>`);
+    }
+}
+
+function handleStreamEvent(event, data, out, id) {
+    const term = document.getElementById('factory-terminal');
+    if (event === 'start') {
+        log(`<div style='color:#888'> > STREAM OPEN | KEY: ${data.key} | IP: ${data.ip} <span class="c-btn" style="border-color:#ff5252; color:#ff5252; cursor:pointer;" onclick="cancelStream('${data.stream_id}')">ABORT</span></div>`);
+        term.appendChild(out);
+    } else if (event === 'token') {
+        out.textContent += data.t;
+        term.scrollTop = term.scrollHeight;
+    } else if (event === 'done') {
+        const linkHtml = pdfSlot(data.pdf_job);
+        log(`
+            <div style="margin-top:20px; border-top: 1px dashed #444; padding-top:10px;">
+                <div style="color:#2196f3; font-weight:bold;">TARGET: ${id} | MOVED TO OUTPUT</div>
+                ${linkHtml}
+                <div style="color:#888; font-size:10px; margin-top:10px;">
+                    SAVED TO: ${data.file} | FIRST TOKEN: ${(data.timing.first_token || 0).toFixed(2)}s | TIME: ${data.duration.toFixed(2)}s
+                </div>
+            </div>
+        `);
+    } else if (event === 'error') {
+        log(`<div style="color:red;">!!! FAILED: ${data.error}</div>`);
+    }
+}
+
+async function cancelStream(streamId) {
+    await fetch('/api/strike_cancel', {method:'POST',headers:{'Content-Type':'application/json'},body:JSON.stringify({stream_id:streamId})});
+}
+
+// Strikes hand back the id of their PDF render; the button only appears once the file exists.
+function pdfSlot(pdfJob) {
+    if(!pdfJob) return "";
+    const slot = `pdf-${pdfJob}`;
+    watchPdf(pdfJob, slot);
+    return `<div id="${slot}" style="color:#888; margin-top:5px;">PDF RENDERING...</div>`;
+}
+
+async function watchPdf(pdfJob, slot) {
+    for (let tries = 0; tries < 300; tries++) {
+        await new Promise(r => setTimeout(r, 1000));
+        let st;
+        try { st = await (await fetch(`/api/pdf_status?id=${pdfJob}`)).json(); } catch(e) { continue; }
+        if (st.error) return;
+        if (!st.finished) continue;
+        const el = document.getElementById(slot);
+        const j = st.jobs[0];
+        if (!el || !j) return;
+        el.innerHTML = j.state === 'SUCCESS'
+            ? `<button style="background:#00e676; color:#000; border:none; padding:5px 10px; font-weight:bold; cursor:pointer; margin-top:5px;" onclick="window.open('${j.path}', '_blank')">OPEN PDF ASSET</button>`
+            : `<span style="color:red;">PDF FAILED: ${j.error}</span>`;
+        return;
+    }
+}
+
+// Polls a server-side strike batch, firing onEntry once per finished strike.
+async function pollBatch(batchId, onEntry) {
+    const seen = new Set();
+    while (true) {
+        let info;
+        try {
+            info = await fetch(`/api/batch_status?id=${batchId}`).then(r=>r.json());
         } catch(e) {
             log(`<div style="color:red;">!!! NETWORK ERROR: ${e}</div>`);
+            await new Promise(r => setTimeout(r, 2000));
+            continue;
         }
-        
-        if(targets.length > 1) await new Promise(r => setTimeout(r, 2000));
+        if (info.status === 'error') return;
+        for (const j of info.jobs) {
+            if (seen.has(j.n) || j.state === 'QUEUED' || j.state === 'RUNNING') continue;
+            seen.add(j.n);
+            onEntry(j);
+        }
+        if (info.finished) return info;
+        await new Promise(r => setTimeout(r, 1000));
     }
-    
-    log("<div style='color:#00e676; margin-top:20px; border-top:2px solid #00e676;'> > EXECUTION COMPLETE.</div>");
-    loadJobs();
 }
 
 async function batchPDF() {
@@ -376,26 +552,41 @@ async function batchPDF() {
     const originalText = btn.innerText;
     btn.innerText = "WORKING...";
     
-    for (const check of checks) {
-        const id = check.value;
-        try {
-            await fetch("/api/generate_pdf", {
-                method: "POST",
-                headers: {"Content-Type": "application/json"},
-                body: JSON.stringify({id: id})
-            });
-            const row = document.getElementById('row-'+id);
-            if(row) {
-                row.style.background = "#1a261a"; 
-                setTimeout(() => row.style.background = "", 500);
+    // Renders run in the server's PDF process pool; submit once, then poll for progress
+    const ids = Array.from(checks).map(c => c.value);
+    let failed = 0;
+    try {
+        const res = await fetch("/api/pdf_jobs", {
+            method: "POST",
+            headers: {"Content-Type": "application/json"},
+            body: JSON.stringify({ids: ids})
+        });
+        const sub = await res.json();
+        if(!sub.batch_id) throw new Error(sub.message || "PDF QUEUE REJECTED");
+        const seen = new Set();
+        while (true) {
+            await new Promise(r => setTimeout(r, 1000));
+            const st = await (await fetch(`/api/pdf_status?id=${sub.batch_id}`)).json();
+            btn.innerText = `WORKING ${st.done}/${st.total}...`;
+            for (const j of st.jobs || []) {
+                if(j.state === 'QUEUED' || seen.has(j.id)) continue;
+                seen.add(j.id);
+                if(j.state !== 'SUCCESS') { failed++; continue; }
+                const row = document.getElementById('row-'+j.id);
+                if(row) {
+                    row.style.background = "#1a261a"; 
+                    setTimeout(() => row.style.background = "", 500);
+                }
             }
-        } catch(e) {
-            console.error(e);
+            if(st.finished) break;
         }
+    } catch(e) {
+        console.error(e);
+        alert("PDF QUEUE ERROR: " + e.message);
     }
     
     btn.innerText = originalText;
-    alert("BATCH PDF RE-COMPILE COMPLETE. REFRESHING GRID.");
+    alert(`BATCH PDF RE-COMPILE COMPLETE${failed ? ` (${failed} FAILED)` : ''}. REFRESHING GRID.`);
     loadJobs(); 
 }
 
@@ -410,35 +601,25 @@ async function runGauntlet() {
     const models = Array.from(opts).map(o => o.value);
     const temp = document.getElementById('temp-slider').value;
     
-    const now = new Date();
-    const sessionId = now.toISOString().replace(/[:.]/g, '-');
+    const res = await fetch('/api/batch', {
+        method:'POST',
+        headers:{'Content-Type':'application/json'},
+        body:JSON.stringify({ids:[currentJobId], models:models, temp:temp, mode:'gauntlet', no_cache:noCache()})
+    });
+    const batch = await res.json();
+    if (batch.status !== 'queued') {
+        log(`<div style="color:red;">!!! FAILURE: ${batch.message}</div>`);
+        return;
+    }
+    log(`<div style='color:#888'> > CONTACTING ${models.length} MODELS...</div>`);
 
-    for (const model of models) {
-        log(`<div style='color:#888'> > CONTACTING: ${model}...</div>`);
-        await new Promise(r => setTimeout(r, 2000)); 
-        
-        try {
-            const res = await fetch('/api/strike', {
-                method:'POST',
-                headers:{'Content-Type':'application/json'},
-                body:JSON.stringify({
-                    id: currentJobId, 
-                    model: model, 
-                    temp: temp,
-                    session_id: sessionId
-                })
-            });
-            const data = await res.json();
-            
-            if (data.status === 'success') {
-                log(`<div style="color:#00e676;">SUCCESS: ${model}</div>`);
-            } else {
-                log(`<div style="color:red;">!!! FAILURE: ${data.error}</div>`);
-            }
-        } catch (e) {
-            log(`<div style="color:red;">!!! NETWORK ERROR: ${e}</div>`);
+    await pollBatch(batch.batch_id, (j) => {
+        if (j.state === 'SUCCESS') {
+            log(`<div style="color:#00e676;">SUCCESS: ${j.model}</div>`);
+        } else {
+            log(`<div style="color:red;">!!! FAILURE (${j.model}): ${j.error}</div>`);
         }
-    }
+    });
     log("<div style='color:#00e676; margin-top:20px; border-top:2px solid #00e676;'> > CAMPAIGN COMPLETE.</div>");
 }
 
@@ -515,13 +696,24 @@ async function executeMigration() {
     const checkboxes = document.querySelectorAll('#modal-file-list input:checked');
     const files = Array.from(checkboxes).map(c => c.value);
     if(files.length===0) return;
-    document.querySelector('#import-modal button:last-child').innerText = "MIGRATING...";
+    const btn = document.querySelector('#import-modal button:last-child');
+    btn.innerText = "MIGRATING...";
+    const ticker = setInterval(async () => {
+        const p = await fetch('/api/migrate_status').then(r=>r.json()).catch(() => ({}));
+        const rows = Object.values(p);
+        if (rows.length === 0) return;
+        const done = rows.filter(f => f.state === 'DONE' || f.state === 'ERROR').length;
+        const parsed = rows.reduce((n, f) => n + f.parsed, 0);
+        btn.innerText = `MIGRATING... ${done}/${rows.length} FILES | ${parsed} JOBS`;
+    }, 1000);
     try {
         const res = await fetch('/api/migrate', {method:'POST',headers:{'Content-Type':'application/json'},body:JSON.stringify({files:files})});
+        clearInterval(ticker);
         const data = await res.json();
         alert(`REPORT: ${data.stats.new} New Jobs Added.`);
         switchTab('PENDING');
-    } catch(e) { alert("Migration Error."); }
+    } catch(e) { clearInterval(ticker); alert("Migration Error."); }
+    btn.innerText = "MIGRATE SELECTED";
     document.getElementById('import-modal').style.display='none';
 }
 
@@ -547,6 +739,7 @@ document.addEventListener('keydown', e => {
         if (focusMode === 'JOBS') {
             const idx = jobList.findIndex(j=>j.id===currentJobId);
             if(jobList[idx+1]) selectJob(jobList[idx+1].id);
+            if(idx + 20 > jobList.length) loadMoreJobs();
         }
         else if (focusMode === 'TAGS') {
             if (currentTagIndex < refineryTags.length - 1) {
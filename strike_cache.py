@@ -0,0 +1,78 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+# --- CONFIG ---
+CACHE_DIR = os.getenv("STRIKE_CACHE_DIR", os.path.join("cache", "strikes"))
+CACHE_MAX_BYTES = int(float(os.getenv("STRIKE_CACHE_MAX_MB", "200")) * 1024 * 1024)
+CACHE_MAX_AGE = float(os.getenv("STRIKE_CACHE_MAX_DAYS", "14")) * 86400
+
+_lock = threading.Lock()
+_size = None  # Running byte total, computed lazily on first write
+
+def cache_key(prompt, model, temp):
+    """Content address of a strike: the fully assembled prompt plus model and temperature."""
+    blob = json.dumps([model, round(float(temp), 3), prompt], ensure_ascii=False)
+    return hashlib.sha256(blob.encode('utf-8')).hexdigest()
+
+def _path(key):
+    return os.path.join(CACHE_DIR, key[:2], f"{key}.json")
+
+def get(key):
+    path = _path(key)
+    try:
+        age = time.time() - os.path.getmtime(path)
+        if age > CACHE_MAX_AGE:
+            _remove(path)
+            return None
+        with open(path, 'r', encoding='utf-8') as f: entry = json.load(f)
+        os.utime(path)  # mtime doubles as last-hit time for LRU eviction
+        return entry
+    except (OSError, ValueError):
+        return None
+
+def put(key, result, model):
+    global _size
+    path = _path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({"model": model, "response": result, "stored": time.time()}, f)
+    with _lock:
+        # Replacing an existing entry only adds the difference
+        try: old = os.path.getsize(path)
+        except OSError: old = 0
+        os.replace(tmp, path)
+        if _size is None: _size = sum(e[2] for e in _scan())
+        else: _size += os.path.getsize(path) - old
+        if _size > CACHE_MAX_BYTES: _evict()
+
+def _scan():
+    out = []
+    for root, _, files in os.walk(CACHE_DIR):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                st = os.stat(path)
+                out.append((st.st_mtime, path, st.st_size))
+            except OSError: pass
+    return out
+
+def _remove(path):
+    try: os.remove(path)
+    except OSError: pass
+
+def _evict():
+    """Drops expired entries, then least-recently-hit ones until under 80% of the cap."""
+    global _size
+    entries = sorted(_scan())
+    now = time.time()
+    total = sum(e[2] for e in entries)
+    for mtime, path, size in entries:
+        if now - mtime <= CACHE_MAX_AGE and total <= CACHE_MAX_BYTES * 0.8: break
+        _remove(path)
+        total -= size
+    _size = total
+    print(f"[*] STRIKE CACHE: evicted down to {total // 1024} KB")
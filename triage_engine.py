@@ -0,0 +1,78 @@
+import re
+import json
+import db_engine
+
+# --- CONFIG ---
+DB_FILE = db_engine.DB_FILE
+# action -> (new status, history counter bumped by the changed count)
+ACTIONS = {"approve": ("APPROVED", "approved"), "deny": ("DENIED", "denied"), "restore": ("NEW", None)}
+# Filter field -> (column, numeric). Only these ever reach the SQL; values are always bound.
+FIELDS = {
+    "annual_pay": ("annual_pay", True), "pay": ("annual_pay", True),
+    "freshness": ("date_posted", True), "date_posted": ("date_posted", True), "age": ("date_posted", True),
+    "score": ("score", True),
+    "status": ("status", False), "city": ("city", False), "state": ("state", False), "company": ("company", False),
+}
+
+CLAUSE_RE = re.compile(r"""\s*(\w+)\s*(<=|>=|!=|<|>|=)\s*("[^"]*"|'[^']*'|[^\s"']+)\s*""")
+AND_RE = re.compile(r"and\b\s*", re.I)
+
+def parse_filter(expr):
+    """'status = NEW AND annual_pay < 40000' -> (sql, params). Clauses are `field op value`
+    joined by AND; freshness is age in days like everywhere else. Raises ValueError on anything
+    outside FIELDS or the six comparison operators. Rows with a NULL in a compared column never match."""
+    clauses, params = [], []
+    expr, pos = expr.strip(), 0
+    while pos < len(expr):
+        if clauses:
+            # Scanned rather than split on AND, so a quoted value may contain the word
+            m = AND_RE.match(expr, pos)
+            if not m: raise ValueError(f"Expected AND at: {expr[pos:]!r}")
+            pos = m.end()
+        m = CLAUSE_RE.match(expr, pos)
+        if not m: raise ValueError(f"Bad filter clause at: {expr[pos:]!r}")
+        pos = m.end()
+        field, op, value = m.group(1).lower(), m.group(2), m.group(3)
+        if field not in FIELDS: raise ValueError(f"Unknown filter field: {field} (use {', '.join(sorted(FIELDS))})")
+        col, numeric = FIELDS[field]
+        if value[:1] in "\"'": value = value[1:-1]
+        if numeric:
+            try: value = float(value)
+            except ValueError: raise ValueError(f"{field} needs a number, got {value!r}")
+        elif col == "status":
+            value = value.upper()
+        clauses.append(f"{col} {op} ?")
+        params.append(value)
+    if not clauses: raise ValueError("Empty filter")
+    return " AND ".join(clauses), params
+
+def apply(action, ids=None, expr=None, conn=None, dry_run=False):
+    """Moves every selected job to the action's status in one transaction.
+    Selection is a list of ids or a filter expression (not both). Jobs already in the target
+    status are left alone. Returns {"matched", "changed", "from": {old status: n}}."""
+    if action not in ACTIONS: raise ValueError(f"Unknown action: {action}")
+    if (ids is None) == (expr is None): raise ValueError("Pass ids or a filter")
+    target = ACTIONS[action][0]
+    if isinstance(ids, str): ids = [ids]
+    if ids is not None:
+        where, params = "id IN (SELECT value FROM json_each(?))", [json.dumps([str(i) for i in ids])]
+    else:
+        where, params = parse_filter(expr)
+    own = conn is None
+    if own: conn = db_engine.connect(DB_FILE)
+    try:
+        conn.execute("BEGIN IMMEDIATE")  # counts and update see the same rows
+        try:
+            before = dict(conn.execute(f"SELECT status, count(*) FROM jobs WHERE {where} GROUP BY status", params).fetchall())
+            matched = sum(before.values())
+            changed = matched - before.pop(target, 0)
+            if changed and not dry_run:
+                conn.execute(f"UPDATE jobs SET status=? WHERE {where} AND status IS NOT ?", [target] + params + [target])
+            if dry_run: conn.rollback()
+            else: conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return {"matched": matched, "changed": changed, "from": before}
+    finally:
+        if own: conn.close()
@@ -1,29 +1,26 @@
-import sqlite3
-import os
-import json
+import db_engine
+import artifact_engine
 
-DB_FILE = 'jobs.db'
+DB_FILE = db_engine.DB_FILE
 
 def unstick():
-    conn = sqlite3.connect(DB_FILE)
-    conn.row_factory = sqlite3.Row
+    """Reconcile tool: rebuilds the artifacts table from targets/ and moves every job
+    that has a resume.json to DELIVERED."""
+    conn = db_engine.connect(DB_FILE)
     c = conn.cursor()
     
-    # Get all jobs
-    jobs = c.execute("SELECT id, title, company FROM jobs").fetchall()
+    rows = artifact_engine.reconcile(conn)
+    print(f"--- ARTIFACT INDEX REBUILT: {len(rows)} target folders on disk ---")
     count = 0
     
-    for job in jobs:
-        # Reconstruct path
-        safe_title = "".join(x for x in job['title'] if x.isalnum() or x in " -_").strip()[:50]
-        safe_company = "".join(x for x in job['company'] if x.isalnum() or x in " -_").strip()[:50]
-        path = f"targets/{safe_title}_{safe_company}_{job['id']}/resume.json"
-        
+    titles = dict(c.execute("SELECT id, title FROM jobs WHERE status != 'DELIVERED'").fetchall())
+    for row in rows:
+        job_id, has_ai = row[0], row[2]
         # If resume.json exists, FORCE status to DELIVERED
-        if os.path.exists(path):
-            c.execute("UPDATE jobs SET status='DELIVERED' WHERE id=?", (job['id'],))
+        if has_ai and job_id in titles:
+            c.execute("UPDATE jobs SET status='DELIVERED' WHERE id=?", (job_id,))
             count += 1
-            print(f"MOVED TO ARMORY: {job['title']}")
+            print(f"MOVED TO ARMORY: {titles[job_id]}")
 
     conn.commit()
     conn.close()